@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'versatileimagefield',
     'django_filters',
 
+    'caching',
     'profiles',
     'products',
     'cart',
@@ -66,6 +67,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'caching.middleware.PageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -110,6 +112,19 @@ DATABASES = {
     }
 }
 
+# Cache tag versions, cached pages, snapshots and search results have to
+# be seen by all web and rendition worker processes, so the cache has to
+# be shared. Per-process caches are refused at startup (caching.apps)
+# unless CACHE_ALLOW_LOCAL is set, as app.test_settings does for tests
+# running in one process.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ.get('MEMCACHED_LOCATION', '127.0.0.1:11211'),
+    }
+}
+CACHE_ALLOW_LOCAL = False
+
 AUTH_USER_MODEL = 'profiles.Profile'
 LOGIN_URL = '/profiles/login/'
 # Password validation
@@ -166,6 +181,64 @@ THUMBNAIL_PROCESSORS = (
     'easy_thumbnails.processors.filters',
 )
 
+# Renditions are generated in background (product.renditions), templates
+# never resize images on demand
+THUMBNAIL_ALIASES = {
+    '': {
+        'product_list': {'size': (360, 480)},
+        'category_list': {'size': (360, 480), 'crop': True},
+        'product_detail': {'size': (460, 690), 'crop': True},
+        'checkout': {'size': (250, 250), 'crop': True},
+        'cart': {'size': (100, 100), 'crop': True},
+        'order': {'size': (50, 50), 'crop': True},
+    },
+}
+CATALOG_THUMBNAIL_ALIASES = [
+    'product_list', 'category_list', 'product_detail', 'checkout', 'cart',
+    'order']
+
+VERSATILEIMAGEFIELD_SETTINGS = {
+    'create_images_on_demand': False,
+}
+VERSATILEIMAGEFIELD_RENDITION_KEY_SETS = {
+    'product_gallery': [
+        ('gallery', 'thumbnail__540x540'),
+        ('gallery_2x', 'thumbnail__1080x1080'),
+        ('thumbnail', 'crop__60x60'),
+    ],
+}
+PRODUCT_IMAGE_RENDITION_SETS = ['product_gallery']
+
+RENDITION_WARMUP_WORKERS = 2
+
+# search.backends.InvertedIndexSearchBackend for databases without
+# full text search, its snapshot is written by build_search_index
+SEARCH_BACKEND = 'search.backends.PostgresSearchBackend'
+SEARCH_INDEX_PATH = os.path.join(BASE_DIR, 'search_index.pickle')
+# search queries are counted in memory and written in bulk, every
+# FLUSH_INTERVAL seconds or once FLUSH_SIZE distinct queries are buffered
+SEARCH_QUERY_LOG_FLUSH_SIZE = 500
+SEARCH_QUERY_LOG_FLUSH_INTERVAL = 60
+SEARCH_POPULAR_QUERIES_CACHE_TIMEOUT = 10 * 60
+# ranked ids of recent queries are kept in process, and in the default
+# cache when SEARCH_RESULTS_SHARED_CACHE is set and the backend does not
+# search an index of its own process
+SEARCH_RESULTS_LOCAL_CACHE_SIZE = 256
+SEARCH_RESULTS_SHARED_CACHE = True
+SEARCH_RESULTS_CACHE_TIMEOUT = 60 * 60
+# only this many best matches are ranked and paginated
+SEARCH_RESULTS_LIMIT = 1000
+
+# anonymous GET requests of these pages are served by
+# caching.middleware.PageCacheMiddleware
+PAGE_CACHE_URL_NAMES = [
+    'products:index', 'products:category', 'products:detail',
+    'product:details', 'product:category']
+PAGE_CACHE_TIMEOUT = 10 * 60
+# rendering of a missing page by another request is waited for this long
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_LOCK_WAIT = 2
+
 
 DEFAULT_CURRENCY = 'USD'
 AVAILABLE_CURRENCIES = [DEFAULT_CURRENCY]
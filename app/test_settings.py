@@ -0,0 +1,13 @@
+"""
+Settings of test runs, which happen in a single process
+
+    python manage.py test --settings=app.test_settings
+"""
+from .settings import *  # noqa
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+CACHE_ALLOW_LOCAL = True
@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+class CachingConfig(AppConfig):
+    name = 'caching'
+
+    def ready(self):
+        # a tag bumped in one process has to purge values of all of them
+        backend = settings.CACHES['default']['BACKEND']
+        allow_local = getattr(settings, 'CACHE_ALLOW_LOCAL', False)
+        if backend in LOCAL_CACHE_BACKENDS and not allow_local:
+            raise ImproperlyConfigured(
+                'Default cache has to be shared by all processes, '
+                '%s is local to each of them' % backend)
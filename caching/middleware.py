@@ -0,0 +1,160 @@
+"""
+Read-through full page cache of anonymous GET requests
+
+Only pages of URL names listed in settings.PAGE_CACHE_URL_NAMES are
+cached. Pages are stored with versions of their caching.tags tags and
+served while none of them has been bumped. The default tag is the
+catalog tag. Views narrow it with set_page_tags(), so saving a product
+purges its own page and the listings, not the pages of other products.
+
+Pages are keyed on absolute URL and language, cookies are not part of
+the key: the session every visitor gets from get_cart() does not change
+catalog pages and cookies set while rendering are not stored. CSRF tokens
+of cached forms are replaced with a placeholder and filled with a token
+of the visitor when the page is served. Pages with flash messages are
+neither served from cache nor stored.
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.urlresolvers import Resolver404, resolve
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.encoding import force_bytes
+from django.utils.translation import get_language
+
+from .tags import CATALOG_TAG, get_tag_versions
+
+PAGE_KEY = 'page:%s'
+PAGE_LOCK_KEY = 'page-lock:%s'
+PAGE_WAIT_INTERVAL = 0.05
+CSRF_PLACEHOLDER = b'__csrf_token__'
+CSRF_INPUT_RE = re.compile(
+    br'''(name=['"]csrfmiddlewaretoken['"] value=['"])[^'"]*''')
+
+
+def set_page_tags(request, *tags):
+    """
+    Purge cached page of request only with the given tags instead of
+    the catalog tag. Call it before loading data the page shows, so
+    a change made meanwhile makes the stored page stale.
+    """
+    request._page_tag_versions = get_tag_versions(tags)
+
+
+def add_page_tags(request, *tags):
+    """
+    Add tags to those set by set_page_tags(), for tags known only once
+    the view has loaded some data
+    """
+    versions = getattr(request, '_page_tag_versions', {})
+    versions.update(get_tag_versions(tags))
+    request._page_tag_versions = versions
+
+
+def get_page_key(request):
+    url = '%s|%s' % (request.build_absolute_uri(), get_language())
+    return hashlib.md5(force_bytes(url)).hexdigest()
+
+
+def has_messages(request):
+    storage = getattr(request, '_messages', None)
+    return storage is not None and len(storage) > 0
+
+
+def is_fresh(entry):
+    versions, _page = entry
+    return get_tag_versions(versions) == versions
+
+
+class PageCacheMiddleware(object):
+    """
+    Only one request renders a missing or purged page, guarded by a lock
+    in the cache. Meanwhile the other requests get the stale page, or wait
+    up to settings.PAGE_CACHE_LOCK_WAIT seconds for a missing one and
+    render it themselves after that.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+        key = get_page_key(request)
+        entry = cache.get(PAGE_KEY % key)
+        if entry is not None and is_fresh(entry):
+            return self.serve(request, entry)
+        lock_key = PAGE_LOCK_KEY % key
+        if not cache.add(lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            if entry is None:
+                entry = self.wait_for_page(key)
+            if entry is not None:
+                return self.serve(request, entry)
+            return self.get_response(request)
+        try:
+            request._page_tag_versions = get_tag_versions([CATALOG_TAG])
+            response = self.get_response(request)
+            if self.is_cacheable_response(request, response):
+                self.store(request, response, key)
+        finally:
+            cache.delete(lock_key)
+        return response
+
+    def is_cacheable_request(self, request):
+        if request.method != 'GET':
+            return False
+        try:
+            view_name = resolve(request.path_info).view_name
+        except Resolver404:
+            return False
+        if view_name not in settings.PAGE_CACHE_URL_NAMES:
+            return False
+        if request.user.is_authenticated:
+            return False
+        return not has_messages(request)
+
+    def is_cacheable_response(self, request, response):
+        if response.status_code != 200 or response.streaming:
+            return False
+        cache_control = response.get('Cache-Control', '')
+        if 'private' in cache_control or 'no-store' in cache_control:
+            return False
+        return not response.cookies and not has_messages(request)
+
+    def store(self, request, response, key):
+        content = response.content
+        if request.META.get('CSRF_COOKIE_USED'):
+            content = CSRF_INPUT_RE.sub(
+                br'\1' + CSRF_PLACEHOLDER, content)
+        # length changes once the CSRF token is filled in
+        headers = [
+            (header, value) for header, value in response.items()
+            if header.lower() != 'content-length']
+        page = (content, response.status_code, headers)
+        cache.set(
+            PAGE_KEY % key, (request._page_tag_versions, page),
+            settings.PAGE_CACHE_TIMEOUT)
+
+    def wait_for_page(self, key):
+        deadline = time.time() + settings.PAGE_CACHE_LOCK_WAIT
+        while time.time() < deadline:
+            time.sleep(PAGE_WAIT_INTERVAL)
+            entry = cache.get(PAGE_KEY % key)
+            if entry is not None and is_fresh(entry):
+                return entry
+        return None
+
+    def serve(self, request, entry):
+        _versions, (content, status, headers) = entry
+        if CSRF_PLACEHOLDER in content:
+            # sets CSRF cookie of the visitor as rendering the form would
+            content = content.replace(
+                CSRF_PLACEHOLDER, force_bytes(get_token(request)))
+        response = HttpResponse(content, status=status)
+        for header, value in headers:
+            response[header] = value
+        return response
@@ -0,0 +1,111 @@
+"""
+Tag based cache invalidation
+
+Cached values declare tags: instance tags ('product.product:42'),
+model tags ('product.category') or free-form ones ('catalog'). Every tag
+has a version stored in the cache, values are stored together with
+versions of their tags and a lookup returns the value only when none of
+the tags has been bumped since, so invalidating a tag drops all values
+tagged with it without touching anything else.
+
+Model changes bump tags through publish_model_tags(), connected from
+signals modules of the apps.
+
+Versions have to be seen by all processes, so the default cache has to
+be shared by them (memcached), see caching.apps.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+CATALOG_TAG = 'catalog'
+TAG_VERSION_KEY = 'tag-version:%s'
+
+
+def _new_version():
+    # time based, so a version evicted from cache never comes back
+    return int(time.time() * 1000)
+
+
+def model_tag(model):
+    return model._meta.label_lower
+
+
+def instance_tag(model, pk):
+    return '%s:%s' % (model_tag(model), pk)
+
+
+def get_tag_versions(tags):
+    """Returns {tag: version}, missing versions are created"""
+    keys = {TAG_VERSION_KEY % tag: tag for tag in tags}
+    stored = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in stored.items()}
+    for key, tag in keys.items():
+        if key not in stored:
+            version = _new_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[tag] = version
+    return versions
+
+
+def get_tag_version(tag):
+    return get_tag_versions([tag])[tag]
+
+
+def invalidate_tags(*tags):
+    for tag in set(tags):
+        key = TAG_VERSION_KEY % tag
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def get_tagged(key, default=None):
+    """Returns value stored by set_tagged(), unless any of its tags was bumped"""
+    entry = cache.get(key)
+    if entry is None:
+        return default
+    versions, value = entry
+    if versions and get_tag_versions(versions) != versions:
+        return default
+    return value
+
+
+def set_tagged(key, value, tags, timeout=None):
+    cache.set(key, (get_tag_versions(tags), value), timeout)
+
+
+def get_or_set_tagged(key, default, tags, timeout=None):
+    """default is a callable building the value on cache miss"""
+    missing = object()
+    value = get_tagged(key, missing)
+    if value is missing:
+        # versions are read before the value is built, so a bump while
+        # building makes the stored value stale instead of lost
+        versions = get_tag_versions(tags)
+        value = default()
+        cache.set(key, (versions, value), timeout)
+    return value
+
+
+def publish_model_tags(model, get_tags=None, catalog=False):
+    """
+    Bump instance tag of saved or deleted instances of model and tags
+    returned by get_tags(instance). The catalog tag, which purges every
+    cached listing and search result, is bumped only for models shown
+    in listings, published with catalog=True.
+    """
+    def receiver(sender, instance, **kwargs):
+        tags = [instance_tag(model, instance.pk)]
+        if catalog:
+            tags.append(CATALOG_TAG)
+        if get_tags is not None:
+            tags.extend(get_tags(instance))
+        invalidate_tags(*tags)
+
+    uid = 'publish_model_tags:%s' % model_tag(model)
+    post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
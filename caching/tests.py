@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import RequestFactory, TestCase
+
+from products.models.product import Product
+
+from .middleware import (
+    CSRF_PLACEHOLDER, PAGE_KEY, PAGE_LOCK_KEY, get_page_key)
+from .tags import (
+    CATALOG_TAG, get_or_set_tagged, get_tagged, instance_tag,
+    invalidate_tags, set_tagged)
+
+
+class CacheTagsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_value_is_dropped_with_any_of_its_tags(self):
+        set_tagged('first', 1, ['a', 'b'])
+        set_tagged('second', 2, ['b'])
+        set_tagged('third', 3, ['c'])
+        invalidate_tags('b')
+        self.assertIsNone(get_tagged('first'))
+        self.assertIsNone(get_tagged('second'))
+        self.assertEqual(get_tagged('third'), 3)
+
+    def test_get_or_set_builds_value_once(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return 'value'
+
+        self.assertEqual(get_or_set_tagged('key', build, ['a']), 'value')
+        self.assertEqual(get_or_set_tagged('key', build, ['a']), 'value')
+        self.assertEqual(len(calls), 1)
+
+    def test_model_changes_publish_tags(self):
+        product = Product.objects.create(
+            name='Test Product', slug='test-product', sku='PROD001',
+            price=100)
+        tag = instance_tag(Product, product.pk)
+        set_tagged('product', 'cached', [tag])
+        set_tagged('catalog', 'cached', [CATALOG_TAG])
+        set_tagged('other', 'cached', [instance_tag(Product, 0)])
+        product.name = 'Renamed'
+        product.save()
+        self.assertIsNone(get_tagged('product'))
+        self.assertIsNone(get_tagged('catalog'))
+        self.assertEqual(get_tagged('other'), 'cached')
+
+
+class PageCacheMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [
+            Product.objects.create(
+                name='Test Product %s' % number,
+                slug='test-product-%s' % number,
+                sku='PROD%03d' % number, price=100)
+            for number in range(2)]
+        self.url = reverse('products:index')
+
+    def test_anonymous_page_is_served_from_cache(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Test Product 1')
+        # cart forms get token of the visitor, not of the cached request
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotIn(CSRF_PLACEHOLDER, response.content)
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_saved_product_purges_pages(self):
+        detail_urls = [product.get_absolute_url() for product in self.products]
+        self.client.get(self.url)
+        for url in detail_urls:
+            self.client.get(url)
+        product = self.products[0]
+        product.name = 'Renamed product'
+        product.save()
+        self.assertContains(self.client.get(self.url), 'Renamed product')
+        self.assertContains(self.client.get(detail_urls[0]), 'Renamed product')
+        # page of the other product is tagged with that product only
+        with self.assertNumQueries(0):
+            self.client.get(detail_urls[1])
+
+    def test_session_cookie_does_not_vary_page(self):
+        self.client.get(self.url)
+        self.client.cookies['sessionid'] = 'abc'
+        with self.assertNumQueries(1):
+            # only the unknown session is looked up
+            self.client.get(self.url)
+
+    def test_other_requests_get_stale_page_while_one_renders(self):
+        self.client.get(self.url)
+        product = self.products[0]
+        product.name = 'Renamed product'
+        product.save()
+        key = get_page_key(RequestFactory().get(self.url))
+        self.assertTrue(cache.get(PAGE_KEY % key))
+        cache.add(PAGE_LOCK_KEY % key, 1)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Test Product 0')
+        cache.delete(PAGE_LOCK_KEY % key)
+        self.assertContains(self.client.get(self.url), 'Renamed product')
+
+    def test_authenticated_users_are_not_served_from_cache(self):
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'password')
+        self.client.get(self.url)
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+        self.assertEqual(
+            len(response.context['object_list']), len(self.products))
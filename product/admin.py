@@ -1,13 +1,20 @@
+import json
+
+from django.conf.urls import url
 from django.contrib import admin
-from django.shortcuts import redirect
+from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import resolve
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_POST
 from .models import *
 from .admin_forms import ProductAdminForm, VariantAttributeAdminForm
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description')
+    list_display = ('name', 'full_path', 'description')
 
 
 # class ProductVariantAdminInline(admin.TabularInline):
@@ -57,6 +64,57 @@ class ProductAdmin(admin.ModelAdmin):
     def response_add(self, request, obj, post_url_continue=None):
         return redirect('/admin/product/product/{}/change'.format(obj.id))
 
+    def save_formset(self, request, form, formset, change):
+        if formset.model is ProductImage:
+            # order all new images at once instead of aggregate per image
+            new_images = [
+                image_form.instance for image_form in formset.extra_forms
+                if image_form.has_changed()
+                and not formset._should_delete_form(image_form)]
+            ProductImage.objects.assign_orders(form.instance, new_images)
+        return super().save_formset(request, form, formset, change)
+
+    def get_urls(self):
+        urls = [
+            url(r'^(?P<pk>\d+)/images/reorder/$',
+                self.admin_site.admin_view(self.reorder_images_view),
+                name='product_product_reorder_images'),
+            url(r'^(?P<pk>\d+)/images/upload/$',
+                self.admin_site.admin_view(self.upload_images_view),
+                name='product_product_upload_images'),
+        ]
+        return urls + super().get_urls()
+
+    def get_changeable_product(self, request, pk):
+        product = get_object_or_404(Product, pk=pk)
+        if not self.has_change_permission(request, product):
+            raise PermissionDenied
+        return product
+
+    @method_decorator(require_POST)
+    def reorder_images_view(self, request, pk):
+        """
+        Expects JSON body {"images": [<image id>, ...]} with all images
+        of product in the new order
+        """
+        product = self.get_changeable_product(request, pk)
+        try:
+            image_ids = json.loads(request.body.decode('utf-8'))['images']
+            ProductImage.objects.reorder(product, image_ids)
+        except (KeyError, TypeError, ValueError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'images': image_ids})
+
+    @method_decorator(require_POST)
+    def upload_images_view(self, request, pk):
+        """Saves all files posted as "images" after existing images"""
+        product = self.get_changeable_product(request, pk)
+        images = ProductImage.objects.bulk_add(product, [
+            ProductImage(image=image)
+            for image in request.FILES.getlist('images')])
+        return JsonResponse(
+            {'images': [image.pk for image in images]}, status=201)
+
 
 admin.site.register(StockLocation)
 
@@ -0,0 +1,109 @@
+from collections import namedtuple
+
+from caching.tags import get_tag_version, invalidate_tags, model_tag
+
+from .models import Category
+
+# bumped by any change of categories
+CATEGORY_TREE_TAG = model_tag(Category)
+
+CategoryNode = namedtuple('CategoryNode', [
+    'id', 'parent_id', 'tree_id', 'lft', 'rght', 'level',
+    'name', 'slug', 'full_path', 'product_count', 'total_product_count'])
+
+
+class CategoryTree(object):
+    """
+    Immutable snapshot of the whole category tree
+
+    Nodes are kept in tree order (tree_id, lft), so every subtree is
+    a contiguous slice of the nodes list and its bounds can be found
+    without walking the tree.
+    """
+
+    def __init__(self, version, nodes):
+        self.version = version
+        self.nodes = list(nodes)
+        self._index = {node.id: i for i, node in enumerate(self.nodes)}
+        self._children = {}
+        for node in self.nodes:
+            self._children.setdefault(node.parent_id, []).append(node)
+
+    def __contains__(self, category_id):
+        return category_id in self._index
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, category_id):
+        index = self._index.get(category_id)
+        if index is None:
+            return None
+        return self.nodes[index]
+
+    def roots(self):
+        return self._children.get(None, [])
+
+    def children(self, category_id):
+        return self._children.get(category_id, [])
+
+    def descendant_range(self, category_id):
+        """
+        Returns (tree_id, lft, rght) bounds of category including
+        its descendants, usable in category__lft__gte/rght__lte filters
+        """
+        node = self.nodes[self._index[category_id]]
+        return node.tree_id, node.lft, node.rght
+
+    def descendants(self, category_id, include_self=True):
+        start = self._index[category_id]
+        node = self.nodes[start]
+        # every node of MPTT subtree takes two numbers between lft and rght
+        end = start + 1 + (node.rght - node.lft - 1) // 2
+        if not include_self:
+            start += 1
+        return self.nodes[start:end]
+
+    def descendant_ids(self, category_id, include_self=True):
+        return [node.id for node in self.descendants(
+            category_id, include_self=include_self)]
+
+    def ancestors(self, category_id):
+        node = self.get(category_id)
+        ancestors = []
+        while node is not None and node.parent_id is not None:
+            node = self.get(node.parent_id)
+            ancestors.append(node)
+        return ancestors[::-1]
+
+
+def build_category_tree(version):
+    categories = Category.objects.order_by('tree_id', 'lft').values_list(
+        *CategoryNode._fields)
+    return CategoryTree(version, (CategoryNode(*row) for row in categories))
+
+
+_snapshot = None
+
+
+def get_category_tree_version():
+    return get_tag_version(CATEGORY_TREE_TAG)
+
+
+def get_category_tree():
+    """
+    Returns process-local category tree snapshot, rebuilt when
+    the shared version has been bumped by invalidate_category_tree()
+    """
+    global _snapshot
+    version = get_category_tree_version()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        snapshot = _snapshot = build_category_tree(version)
+    return snapshot
+
+
+def invalidate_category_tree():
+    global _snapshot
+    _snapshot = None
+    invalidate_tags(CATEGORY_TREE_TAG)
@@ -9,7 +9,6 @@ from django_filters import (
     MultipleChoiceFilter,
     RangeFilter,
     OrderingFilter)
-from django_prices.models import PriceField
 
 from .models import Product, ProductAttribute
 
@@ -18,22 +17,27 @@ SORT_BY_FIELDS = OrderedDict([
     ('name', pgettext_lazy('Product list sorting option', 'name')),
     ('price', pgettext_lazy('Product list sorting option', 'price'))])
 
+# sorting option -> indexed model field
+SORT_BY_MODEL_FIELDS = OrderedDict([
+    ('name', 'name'),
+    ('price', 'min_price')])
+
 
 class ProductFilter(FilterSet):
     sort_by = OrderingFilter(
         label=pgettext_lazy('Product list sorting form', 'Sort by'),
-        fields=SORT_BY_FIELDS.keys(),
-        field_labels=SORT_BY_FIELDS
+        fields=[(field, option)
+                for option, field in SORT_BY_MODEL_FIELDS.items()],
+        field_labels={field: SORT_BY_FIELDS[option]
+                      for option, field in SORT_BY_MODEL_FIELDS.items()}
     )
+    price = RangeFilter(
+        label=pgettext_lazy('Product list filter', 'price'),
+        method='filter_price_range')
 
     class Meta:
         model = Product
         fields = ['price']
-        filter_overrides = {
-            PriceField: {
-                'filter_class': RangeFilter
-            }
-        }
 
     def __init__(self, *args, **kwargs):
         super(ProductFilter, self).__init__(*args, **kwargs)
@@ -87,6 +91,15 @@ class ProductFilter(FilterSet):
     def _get_attribute_choices(self, attribute):
         return [(choice.pk, choice.name) for choice in attribute.values.all()]
 
+    def filter_price_range(self, queryset, name, value):
+        """Products with any variant price within the range"""
+        if value:
+            if value.start is not None:
+                queryset = queryset.filter(max_price__gte=value.start)
+            if value.stop is not None:
+                queryset = queryset.filter(min_price__lte=value.stop)
+        return queryset
+
     def validate_sort_by(self, value):
         if value.strip('-') not in SORT_BY_FIELDS:
             raise ValidationError(
@@ -0,0 +1,330 @@
+import csv
+import datetime
+import io
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.encoding import smart_text
+from django_prices.models import Price
+
+from caching.tags import CATALOG_TAG, invalidate_tags
+
+from .category_tree import invalidate_category_tree
+from .models import (
+    AttributeChoiceValue, Category, Collection, Product, ProductAttribute,
+    ProductType, ProductVariant, Stock, StockLocation)
+
+PRODUCT_ATTRIBUTE_PREFIX = 'attribute:'
+VARIANT_ATTRIBUTE_PREFIX = 'variant-attribute:'
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+
+
+class InvalidRow(ValueError):
+    pass
+
+
+def read_rows(path, file_format=None):
+    """
+    Stream rows of a CSV or JSON lines file as dicts
+    Format is guessed from file extension when not given.
+    """
+    if file_format is None:
+        is_jsonl = path.endswith(('.jsonl', '.json'))
+        file_format = 'jsonl' if is_jsonl else 'csv'
+    with io.open(path, encoding='utf-8', newline='') as stream:
+        if file_format == 'csv':
+            for row in csv.DictReader(stream):
+                yield row
+        elif file_format == 'jsonl':
+            for line in stream:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            raise ValueError('Unknown file format: %s' % file_format)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_price(value, required=True):
+    if value in (None, ''):
+        if required:
+            raise InvalidRow('Price is required')
+        return None
+    try:
+        amount = Decimal(smart_text(value))
+    except InvalidOperation:
+        raise InvalidRow('Invalid price: %s' % value)
+    return Price(amount, currency=settings.DEFAULT_CURRENCY)
+
+
+def parse_bool(value, default):
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    return smart_text(value).strip().lower() in TRUE_VALUES
+
+
+def parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise InvalidRow('Invalid date: %s' % value)
+
+
+def flat_row_to_product(row):
+    """
+    Converts a flat (CSV) row into the nested JSON lines structure:
+    one product with a single variant
+    """
+    product = {}
+    product_attributes = {}
+    variant_attributes = {}
+    for key, value in row.items():
+        if key.startswith(PRODUCT_ATTRIBUTE_PREFIX):
+            if value:
+                slug = key[len(PRODUCT_ATTRIBUTE_PREFIX):]
+                product_attributes[slug] = value
+        elif key.startswith(VARIANT_ATTRIBUTE_PREFIX):
+            if value:
+                slug = key[len(VARIANT_ATTRIBUTE_PREFIX):]
+                variant_attributes[slug] = value
+        else:
+            product[key] = value
+    variant = {
+        'sku': product.pop('sku', None),
+        'name': product.pop('variant_name', None),
+        'price_override': product.pop('price_override', None),
+        'attributes': variant_attributes}
+    location = product.pop('location', None)
+    quantity = product.pop('quantity', None)
+    cost_price = product.pop('cost_price', None)
+    if quantity not in (None, ''):
+        variant['stock'] = [{
+            'location': location, 'quantity': quantity,
+            'cost_price': cost_price}]
+    collections = product.pop('collections', None) or ''
+    product['collections'] = [c for c in collections.split('|') if c]
+    product['attributes'] = product_attributes
+    product['variants'] = [variant] if variant['sku'] else []
+    return product
+
+
+class ProductImporter(object):
+    """
+    Bulk imports products with variants, stock and collection memberships
+
+    All referenced objects (product types, categories, attribute values,
+    stock locations, collections) are loaded once into lookup maps, every
+    chunk of rows is validated and saved with a few bulk_create calls.
+    Model signals are not sent, so slugs and price ranges are computed
+    in memory and category counters, category tree snapshot and home page
+    products are rebuilt once in finish().
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+        self.product_types = {
+            product_type.name.lower(): product_type
+            for product_type in ProductType.objects.all()}
+        self.categories = {}
+        categories = Category.objects.values_list('pk', 'full_path')
+        for pk, full_path in categories:
+            self.categories[full_path] = pk
+            self.categories[smart_text(pk)] = pk
+        self.attributes = {
+            attribute.slug: attribute
+            for attribute in ProductAttribute.objects.all()}
+        self.attribute_values = {}
+        for value in AttributeChoiceValue.objects.all():
+            values = self.attribute_values.setdefault(
+                value.attribute_id, {})
+            values[value.slug] = value.pk
+            values[value.name.lower()] = value.pk
+        self.locations = {
+            location.name.lower(): location.pk
+            for location in StockLocation.objects.all()}
+        self.collections = dict(Collection.objects.values_list('slug', 'pk'))
+        self.rows = 0
+        self.imported = 0
+        self.errors = []
+        self.started = None
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.time() - (self.started or time.time())
+        return self.rows / elapsed if elapsed else 0.0
+
+    def run(self, rows, callback=None):
+        self.started = time.time()
+        for chunk in chunked(rows, self.chunk_size):
+            self.import_chunk(chunk)
+            if callback is not None:
+                callback(self)
+        self.finish()
+
+    def finish(self):
+        Category.objects.rebuild_product_counts()
+        invalidate_category_tree()
+        invalidate_tags(CATALOG_TAG)
+
+    def clean_attributes(self, values):
+        attributes = {}
+        for slug, value in (values or {}).items():
+            attribute = self.attributes.get(slug)
+            if attribute is None:
+                raise InvalidRow('Unknown attribute: %s' % slug)
+            choices = self.attribute_values.get(attribute.pk)
+            if choices:
+                value_pk = choices.get(smart_text(value).lower())
+                if value_pk is None:
+                    raise InvalidRow(
+                        'Unknown value %s of attribute %s' % (value, slug))
+                value = value_pk
+            attributes[smart_text(attribute.pk)] = smart_text(value)
+        return attributes
+
+    def clean_stock(self, stock):
+        location = stock.get('location')
+        location_id = None
+        if location:
+            location_id = self.locations.get(smart_text(location).lower())
+            if location_id is None:
+                raise InvalidRow('Unknown stock location: %s' % location)
+        try:
+            quantity = int(stock.get('quantity') or 0)
+        except ValueError:
+            raise InvalidRow('Invalid quantity: %s' % stock.get('quantity'))
+        return Stock(
+            location_id=location_id, quantity=max(quantity, 0),
+            cost_price=parse_price(stock.get('cost_price'), required=False))
+
+    def clean_variant(self, data):
+        sku = smart_text(data.get('sku') or '').strip()
+        if not sku or len(sku) > 32:
+            raise InvalidRow('Invalid SKU: %r' % sku)
+        variant = ProductVariant(
+            sku=sku, name=data.get('name') or '',
+            price_override=parse_price(
+                data.get('price_override'), required=False),
+            attributes=self.clean_attributes(data.get('attributes')))
+        stock = [self.clean_stock(item) for item in data.get('stock') or []]
+        locations = [item.location_id for item in stock]
+        if len(set(locations)) < len(locations):
+            raise InvalidRow('Duplicate stock location of SKU %s' % sku)
+        return variant, stock
+
+    def clean_row(self, row):
+        if 'variants' not in row:
+            row = flat_row_to_product(row)
+        name = smart_text(row.get('name') or '').strip()
+        if not name or len(name) > 128:
+            raise InvalidRow('Invalid name: %r' % name)
+        product_type = self.product_types.get(
+            smart_text(row.get('product_type') or '').lower())
+        if product_type is None:
+            raise InvalidRow(
+                'Unknown product type: %s' % row.get('product_type'))
+        category_id = self.categories.get(smart_text(row.get('category')))
+        if category_id is None:
+            raise InvalidRow('Unknown category: %s' % row.get('category'))
+        collection_ids = []
+        for slug in row.get('collections') or []:
+            if slug not in self.collections:
+                raise InvalidRow('Unknown collection: %s' % slug)
+            collection_ids.append(self.collections[slug])
+        product = Product(
+            product_type=product_type, category_id=category_id, name=name,
+            description=row.get('description') or '',
+            price=parse_price(row.get('price')),
+            available_on=parse_date(row.get('available_on')),
+            is_published=parse_bool(row.get('is_published'), True),
+            is_featured=parse_bool(row.get('is_featured'), False),
+            attributes=self.clean_attributes(row.get('attributes')))
+        product.slug = product.build_slug()
+        variants = [self.clean_variant(data) for data in row['variants']]
+        prices = [
+            variant.price_override or product.price
+            for variant, _stock in variants] or [product.price]
+        product.min_price = min(prices, key=lambda price: price.net)
+        product.max_price = max(prices, key=lambda price: price.net)
+        return product, variants, collection_ids
+
+    def import_chunk(self, rows):
+        cleaned = []
+        skus = set()
+        for row_number, row in enumerate(rows, start=self.rows + 1):
+            try:
+                product, variants, collection_ids = self.clean_row(row)
+            except InvalidRow as e:
+                self.errors.append((row_number, smart_text(e)))
+                continue
+            row_skus = [variant.sku for variant, _stock in variants]
+            duplicated = len(set(row_skus)) < len(row_skus)
+            if duplicated or skus.intersection(row_skus):
+                self.errors.append((row_number, 'Duplicate SKU in file'))
+                continue
+            skus.update(row_skus)
+            cleaned.append((row_number, product, variants, collection_ids))
+        self.rows += len(rows)
+
+        existing = set(ProductVariant.objects.filter(
+            sku__in=skus).values_list('sku', flat=True))
+        if existing:
+            valid = []
+            for item in cleaned:
+                if any(v.sku in existing for v, _stock in item[2]):
+                    self.errors.append((item[0], 'SKU already exists'))
+                else:
+                    valid.append(item)
+            cleaned = valid
+        if not cleaned:
+            return
+
+        with transaction.atomic():
+            products = Product.objects.bulk_create(
+                [product for _row, product, _v, _c in cleaned])
+            variants = []
+            for product, (_row, _p, product_variants, _c) in zip(
+                    products, cleaned):
+                if not product_variants:
+                    # same default variant as product_save_receiver creates
+                    default = ProductVariant(
+                        name='Default',
+                        sku='{} - {} - default'.format(
+                            product.pk, product.name)[:32])
+                    product_variants.append((default, []))
+                for variant, _stock in product_variants:
+                    variant.product_id = product.pk
+                    variants.append(variant)
+            ProductVariant.objects.bulk_create(variants)
+            stock = []
+            memberships = []
+            Membership = Collection.products.through
+            for product, (_row, _p, product_variants, collection_ids) in zip(
+                    products, cleaned):
+                for variant, variant_stock in product_variants:
+                    for item in variant_stock:
+                        item.variant_id = variant.pk
+                        stock.append(item)
+                memberships.extend(
+                    Membership(collection_id=collection_id,
+                               product_id=product.pk)
+                    for collection_id in collection_ids)
+            Stock.objects.bulk_create(stock)
+            Membership.objects.bulk_create(memberships)
+        self.imported += len(products)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from product.importers import ProductImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import products from CSV or JSON lines file. '
+        'Product types, categories, attributes, stock locations and '
+        'collections have to exist already.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'], dest='file_format',
+            help='File format, guessed from extension by default')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of rows validated and saved at once')
+
+    def handle(self, *args, **options):
+        importer = ProductImporter(chunk_size=options['chunk_size'])
+        rows = read_rows(options['path'], options['file_format'])
+        importer.run(rows, callback=self.report_progress)
+        for row_number, error in importer.errors:
+            self.stderr.write('Row %d: %s' % (row_number, error))
+        self.stdout.write(
+            'Imported %d of %d rows (%d errors), %.1f rows/s' % (
+                importer.imported, importer.rows, len(importer.errors),
+                importer.rows_per_second))
+
+    def report_progress(self, importer):
+        if self.verbosity > 1:
+            self.stdout.write('%d rows, %.1f rows/s' % (
+                importer.rows, importer.rows_per_second))
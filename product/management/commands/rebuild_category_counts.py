@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from product.category_tree import invalidate_category_tree
+from product.models import Category
+
+
+class Command(BaseCommand):
+    help = 'Recompute published product counts of all categories'
+
+    def handle(self, *args, **options):
+        changed = Category.objects.rebuild_product_counts()
+        invalidate_category_tree()
+        self.stdout.write('Updated counts of %d categories' % changed)
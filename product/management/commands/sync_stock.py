@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from product.importers import read_rows
+from product.models import StockLocation
+from product.stock_sync import StockSynchronizer
+
+
+class Command(BaseCommand):
+    help = (
+        'Synchronize stock of a location with a full snapshot file '
+        '(CSV or JSON lines with "sku" and "quantity" columns)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--location', required=True,
+            help='Name or id of the stock location')
+        parser.add_argument(
+            '--format', choices=['csv', 'jsonl'], dest='file_format',
+            help='File format, guessed from extension by default')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument(
+            '--keep-missing', action='store_true',
+            help='Do not zero stock of variants missing in the snapshot')
+        parser.add_argument(
+            '--changed-output',
+            help='Write ids of changed variants to this file ("-" for stdout)')
+
+    def get_location(self, value):
+        lookup = {'pk': value} if value.isdigit() else {'name': value}
+        try:
+            return StockLocation.objects.get(**lookup)
+        except StockLocation.DoesNotExist:
+            raise CommandError('Stock location %s does not exist' % value)
+
+    def handle(self, *args, **options):
+        synchronizer = StockSynchronizer(
+            self.get_location(options['location']),
+            chunk_size=options['chunk_size'],
+            zero_missing=not options['keep_missing'])
+        rows = read_rows(options['path'], options['file_format'])
+        changed = synchronizer.run(rows, callback=self.report_progress)
+        output = options['changed_output']
+        if output == '-':
+            for variant_id in sorted(changed):
+                self.stdout.write(str(variant_id))
+        elif output:
+            with open(output, 'w') as stream:
+                stream.writelines(
+                    '%d\n' % variant_id for variant_id in sorted(changed))
+        self.stderr.write(
+            '%d rows, %d changed variants, %d unknown SKUs, '
+            '%d invalid rows, %.1f rows/s' % (
+                synchronizer.rows, len(changed), synchronizer.unknown_skus,
+                synchronizer.invalid_rows, synchronizer.rows_per_second))
+
+    def report_progress(self, synchronizer):
+        if self.verbosity > 1:
+            self.stderr.write('%d rows, %.1f rows/s' % (
+                synchronizer.rows, synchronizer.rows_per_second))
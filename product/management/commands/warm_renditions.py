@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from product import renditions
+from product.importers import chunked
+from product.models import ProductImage
+from products.models.product import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate missing renditions of product gallery images and '
+        'thumbnails of catalog product images in parallel')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        images = ProductImage.objects.exclude(
+            renditions__contains=settings.PRODUCT_IMAGE_RENDITION_SETS)
+        products = Product.objects.filter(image__isnull=False)
+        pool = renditions.get_pool()
+        jobs = []
+        for batch in chunked(
+                images.values_list('pk', flat=True).iterator(), batch_size):
+            jobs.append(pool.apply_async(
+                renditions.create_product_image_renditions, (batch,)))
+        for batch in chunked(
+                products.values_list('pk', flat=True).iterator(), batch_size):
+            jobs.append(pool.apply_async(
+                renditions.create_catalog_thumbnails, (batch,)))
+        warmed = 0
+        for done, job in enumerate(jobs, start=1):
+            warmed += job.get()
+            if self.verbosity > 1:
+                self.stdout.write('%d/%d batches done' % (done, len(jobs)))
+        self.stdout.write(
+            'Generated renditions of %d images in %d batches' % (
+                warmed, len(jobs)))
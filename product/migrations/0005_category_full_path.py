@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_full_paths(apps, schema_editor):
+    Category = apps.get_model('product', 'Category')
+    paths = {}
+    categories = Category.objects.order_by('tree_id', 'lft').only(
+        'id', 'parent_id', 'slug')
+    # tree order guarantees parents are visited before their children
+    for category in categories.iterator():
+        if category.parent_id:
+            path = '%s/%s' % (paths[category.parent_id], category.slug)
+        else:
+            path = category.slug
+        paths[category.id] = path
+        Category.objects.filter(pk=category.pk).update(full_path=path)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_auto_20180320_1525'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='full_path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=1024, verbose_name='full path'),
+        ),
+        migrations.RunPython(fill_full_paths, migrations.RunPython.noop),
+    ]
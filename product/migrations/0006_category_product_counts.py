@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_product_counts(apps, schema_editor):
+    Category = apps.get_model('product', 'Category')
+    Product = apps.get_model('product', 'Product')
+    direct = dict(
+        Product.objects.filter(is_published=True)
+        .values('category_id')
+        .annotate(count=models.Count('id'))
+        .values_list('category_id', 'count'))
+    totals = {}
+    stack = []
+    categories = Category.objects.order_by('tree_id', 'lft').values_list(
+        'id', 'tree_id', 'rght')
+    for pk, tree_id, rght in categories.iterator():
+        while stack and (stack[-1][1] != tree_id or stack[-1][2] < rght):
+            node = stack.pop()
+            if stack:
+                totals[stack[-1][0]] += totals[node[0]]
+        totals[pk] = direct.get(pk, 0)
+        stack.append((pk, tree_id, rght))
+    while stack:
+        node = stack.pop()
+        if stack:
+            totals[stack[-1][0]] += totals[node[0]]
+    for pk, total in totals.items():
+        if total:
+            Category.objects.filter(pk=pk).update(
+                product_count=direct.get(pk, 0), total_product_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0005_category_full_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='total_product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_product_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.utils.encoding import smart_text
+from django.utils.text import slugify
+from text_unidecode import unidecode
+
+BATCH_SIZE = 1000
+
+
+def fill_slugs(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    last_pk = 0
+    while True:
+        batch = list(
+            Product.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'name')[:BATCH_SIZE])
+        if not batch:
+            break
+        # one UPDATE per batch
+        Product.objects.filter(pk__in=[pk for pk, _name in batch]).update(
+            slug=models.Case(
+                *[models.When(pk=pk, then=models.Value(
+                    slugify(smart_text(unidecode(name)))))
+                  for pk, name in batch],
+                output_field=models.SlugField()))
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0006_category_product_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(blank=True, editable=False, max_length=128),
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django_prices.models
+
+
+def fill_price_ranges(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    ProductVariant = apps.get_model('product', 'ProductVariant')
+    price_field = models.DecimalField(max_digits=12, decimal_places=2)
+    effective_price = Coalesce(
+        'price_override', 'product__price', output_field=price_field)
+    ranges = (
+        ProductVariant.objects.values('product_id')
+        .annotate(min_price=models.Min(effective_price),
+                  max_price=models.Max(effective_price))
+        .values_list('product_id', 'min_price', 'max_price'))
+    for product_id, min_price, max_price in ranges.iterator():
+        Product.objects.filter(pk=product_id).update(
+            min_price=min_price, max_price=max_price)
+    # products without variants
+    Product.objects.filter(min_price__isnull=True).update(
+        min_price=models.F('price'), max_price=models.F('price'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0008_productimage_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='max_price',
+            field=django_prices.models.PriceField(blank=True, currency='USD', db_index=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='min_price',
+            field=django_prices.models.PriceField(blank=True, currency='USD', db_index=True, decimal_places=2, editable=False, max_digits=12, null=True),
+        ),
+        migrations.RunPython(fill_price_ranges, migrations.RunPython.noop),
+    ]
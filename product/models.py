@@ -4,12 +4,13 @@ import datetime
 from decimal import Decimal
 
 from django.conf import settings
-from django.contrib.postgres.fields import HStoreField
+from django.contrib.postgres.fields import ArrayField, HStoreField
 from django.core.urlresolvers import reverse
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
-from django.db.models import F, Max, Q
-from django.db.models.signals import post_save
+from django.db import connection, models, transaction
+from django.db.models import (
+    Case, DecimalField, F, IntegerField, Max, Min, Prefetch, Q, Value, When)
+from django.db.models.functions import Coalesce, Concat, Greatest, Substr
 from django.utils.encoding import smart_text
 from django.utils.text import slugify
 from django.utils.translation import pgettext_lazy
@@ -22,11 +23,107 @@ from satchless.item import InsufficientStock, Item, ItemRange
 from text_unidecode import unidecode
 from versatileimagefield.fields import VersatileImageField, PPOIField
 
+from caching.tags import instance_tag, invalidate_tags
+
+from . import renditions
+
 # from ..discount.models import calculate_discounted_price
 # from ..search import index
 # from .utils import *
 
 
+class CategoryQuerySet(models.QuerySet):
+    def by_path(self, path):
+        return self.filter(full_path=path)
+
+    def adjust_product_count(self, category_id, delta):
+        """
+        Add delta to published product counts of category and
+        to subtree counts of its ancestors (O(depth) rows, 3 statements)
+        """
+        bounds = self.filter(pk=category_id).values(
+            'tree_id', 'lft', 'rght').first()
+        if bounds is None:
+            return
+        self.filter(pk=category_id).update(
+            product_count=F('product_count') + delta)
+        self.filter(
+            tree_id=bounds['tree_id'],
+            lft__lte=bounds['lft'], rght__gte=bounds['rght']).update(
+                total_product_count=F('total_product_count') + delta)
+
+    def update_subtree_paths(self, category_id, old_path):
+        """
+        Rewrite full paths of descendants of category, which start with
+        its old_path, to start with its stored full path (one UPDATE),
+        and bump their instance tags, pages showing them are purged
+        """
+        node = self.filter(pk=category_id).values(
+            'tree_id', 'lft', 'rght', 'full_path').first()
+        if node is None or node['full_path'] == old_path:
+            return
+        descendants = self.filter(
+            tree_id=node['tree_id'], lft__gt=node['lft'],
+            rght__lt=node['rght'])
+        descendant_ids = list(descendants.values_list('pk', flat=True))
+        descendants.update(full_path=Concat(
+            Value(node['full_path']), Substr('full_path', len(old_path) + 1),
+            output_field=models.CharField()))
+        invalidate_tags(*[
+            instance_tag(Category, pk) for pk in descendant_ids])
+
+    def rebuild_tree_product_counts(self, tree_ids):
+        """Rebuild product counts of the given trees"""
+        return self.filter(tree_id__in=tree_ids).rebuild_product_counts()
+
+    def rebuild_product_counts(self, batch_size=500):
+        """
+        Recompute product counts of categories in a single pass over
+        the tree order, writing only the changed rows. The queryset has
+        to consist of whole trees.
+        """
+        direct = dict(
+            Product.objects.filter(
+                is_published=True, category__in=self.values('pk'))
+            .values('category_id')
+            .annotate(count=models.Count('id'))
+            .values_list('category_id', 'count'))
+        categories = self.order_by('tree_id', 'lft').values_list(
+            'id', 'tree_id', 'rght', 'product_count', 'total_product_count')
+        changed = []
+        # open ancestors of current node: [id, tree_id, rght, stored, total]
+        stack = []
+
+        def close_node():
+            node = stack.pop()
+            if stack:
+                stack[-1][4] += node[4]
+            counts = (direct.get(node[0], 0), node[4])
+            if counts != node[3]:
+                changed.append((node[0],) + counts)
+
+        for pk, tree_id, rght, count, total in categories.iterator():
+            while stack and (stack[-1][1] != tree_id or stack[-1][2] < rght):
+                close_node()
+            stack.append(
+                [pk, tree_id, rght, (count, total), direct.get(pk, 0)])
+        while stack:
+            close_node()
+
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            self.filter(pk__in=[row[0] for row in batch]).update(
+                product_count=Case(
+                    *[When(pk=pk, then=Value(count))
+                      for pk, count, _total in batch],
+                    output_field=models.IntegerField()),
+                total_product_count=Case(
+                    *[When(pk=pk, then=Value(total))
+                      for pk, _count, total in batch],
+                    output_field=models.IntegerField()))
+        return len(changed)
+
+
 class Category(MPTTModel):
     """
     Category model
@@ -36,6 +133,11 @@ class Category(MPTTModel):
         slug: category slug, using for beautiful urls
         description: category description
         parent: parent category
+        full_path: slugs of ancestors and category itself joined with "/",
+            maintained on save and on MPTT moves (see product.signals)
+        product_count: number of published products in category
+        total_product_count: number of published products in category
+            and all its descendants
     """
     name = models.CharField(
         pgettext_lazy('Category field', 'name'),
@@ -51,8 +153,14 @@ class Category(MPTTModel):
         null=True, blank=True,
         related_name='children',
         verbose_name=pgettext_lazy('Category field', 'parent'))
-
-    objects = models.Manager()
+    full_path = models.CharField(
+        pgettext_lazy('Category field', 'full path'),
+        max_length=1024, db_index=True, blank=True, editable=False)
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    total_product_count = models.PositiveIntegerField(
+        default=0, editable=False)
+
+    objects = CategoryQuerySet.as_manager()
     tree = TreeManager()
 
     class Meta:
@@ -70,7 +178,37 @@ class Category(MPTTModel):
                        kwargs={'path': self.get_full_path(ancestors),
                                'category_id': self.id})
 
+    def save(self, *args, **kwargs):
+        # stored state, the one of this instance may be stale
+        stored = None
+        if self.pk:
+            stored = Category.objects.filter(pk=self.pk).values(
+                'full_path', 'parent_id', 'tree_id').first()
+        self.full_path = self.build_full_path()
+        # MPTT sends node_moved from within save() when the parent has
+        # changed, the move is handled below instead of in the receiver
+        self._is_saving = True
+        try:
+            super(Category, self).save(*args, **kwargs)
+        finally:
+            self._is_saving = False
+        if not stored:
+            return
+        if stored['parent_id'] != self.parent_id:
+            # subtree moved, so subtree counts of old and new ancestors
+            # changed
+            Category.objects.rebuild_tree_product_counts(
+                {stored['tree_id'], self.tree_id})
+        Category.objects.update_subtree_paths(self.pk, stored['full_path'])
+
+    def build_full_path(self):
+        if not self.parent_id:
+            return self.slug
+        return '%s/%s' % (self.parent.full_path, self.slug)
+
     def get_full_path(self, ancestors=None):
+        if self.full_path:
+            return self.full_path
         if not self.parent_id:
             return self.slug
         if not ancestors:
@@ -114,6 +252,14 @@ class ProductQuerySet(models.QuerySet):
             Q(available_on__lte=today) | Q(available_on__isnull=True),
             Q(is_published=True))
 
+    def with_variant_stock(self):
+        """
+        Prefetch variants annotated with their stock aggregates, so stock
+        checks over all variants of the products cost a single query
+        """
+        return self.prefetch_related(
+            Prefetch('variants', queryset=ProductVariant.objects.with_stock()))
+
 
 class Product(models.Model, ItemRange):
     """
@@ -122,6 +268,7 @@ class Product(models.Model, ItemRange):
     Attributes:
         product_type: type of product, which defines product attributes
         name: product name
+        slug: slug built from name, maintained on save
         description: product description
         categories: product categories
         price: product price
@@ -130,11 +277,15 @@ class Product(models.Model, ItemRange):
         attributes: product attributes
         updated_at: date when product was updated
         is_featured: is product displays on main page
+        min_price, max_price: range of effective variant prices
+            (price_override or product price), maintained on product
+            and variant changes
 
     """
     product_type = models.ForeignKey(
         ProductType, related_name='products', on_delete=models.CASCADE)
     name = models.CharField(max_length=128)
+    slug = models.SlugField(max_length=128, blank=True, editable=False)
     description = models.TextField()
     category = models.ForeignKey(
         Category, related_name='products', on_delete=models.CASCADE)
@@ -145,6 +296,12 @@ class Product(models.Model, ItemRange):
     attributes = HStoreField(default={})
     updated_at = models.DateTimeField(auto_now=True, null=True)
     is_featured = models.BooleanField(default=False)
+    min_price = PriceField(
+        currency=settings.DEFAULT_CURRENCY, max_digits=12, decimal_places=2,
+        blank=True, null=True, db_index=True, editable=False)
+    max_price = PriceField(
+        currency=settings.DEFAULT_CURRENCY, max_digits=12, decimal_places=2,
+        blank=True, null=True, db_index=True, editable=False)
 
     objects = ProductQuerySet.as_manager()
 
@@ -173,13 +330,28 @@ class Product(models.Model, ItemRange):
             'product:details',
             kwargs={'slug': self.get_slug(), 'product_id': self.id})
 
-    def get_slug(self):
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'name' in update_fields:
+            self.slug = self.build_slug()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'slug'}
+        super(Product, self).save(*args, **kwargs)
+
+    def build_slug(self):
         """
         Create slug from name field
         :return:
         """
         return slugify(smart_text(unidecode(self.name)))
 
+    def get_slug(self):
+        """
+        Stored slug, falls back to building it for unsaved products
+        :return:
+        """
+        return self.slug or self.build_slug()
+
     def is_in_stock(self):
         return any(variant.is_in_stock() for variant in self)
 
@@ -194,10 +366,10 @@ class Product(models.Model, ItemRange):
         return self.available_on is None or self.available_on <= today
 
     def get_first_image(self):
-        first_image = self.images.first()
-
-        if first_image:
-            return first_image.image
+        # indexing all() reuses prefetched images
+        images = self.images.all()[:1]
+        if images:
+            return images[0].image
         return None
 
     def get_attribute(self, pk):
@@ -240,7 +412,28 @@ class Product(models.Model, ItemRange):
     #         return super(Product, self).get_price_range(
     #             discounts=discounts, **kwargs)
 
+    def update_price_range(self):
+        """
+        Recompute stored price range from variants (one aggregate query
+        and one UPDATE)
+        """
+        price_field = DecimalField(max_digits=12, decimal_places=2)
+        effective_price = Coalesce(
+            'price_override', 'product__price', output_field=price_field)
+        prices = self.variants.aggregate(
+            min_price=Min(effective_price), max_price=Max(effective_price))
+        min_price = prices['min_price']
+        max_price = prices['max_price']
+        if min_price is None:
+            min_price = max_price = self.price.net
+        Product.objects.filter(pk=self.pk).update(
+            min_price=min_price, max_price=max_price)
+        self.min_price = Price(min_price, currency=settings.DEFAULT_CURRENCY)
+        self.max_price = Price(max_price, currency=settings.DEFAULT_CURRENCY)
+
     def get_gross_price_range(self, **kwargs):
+        if self.min_price is not None and not kwargs:
+            return PriceRange(self.min_price, self.max_price)
         grosses = [self.get_price_per_item(item, **kwargs) for item in self]
         if not grosses:
             return None
@@ -248,17 +441,35 @@ class Product(models.Model, ItemRange):
         return PriceRange(min(grosses), max(grosses))
 
 
-# creating default variation for each product, not important
-def product_save_receiver(sender, instance, created, **kwargs):
-    product = instance
-    variations = product.variants.all()
-    if variations.count() == 0:
-        new_var = ProductVariant()
-        new_var.product = product
-        new_var.name = 'Default'
-        new_var.sku = '{} - {} - default'.format(product.id, product.name)
-        new_var.save()
-post_save.connect(product_save_receiver, sender=Product)
+class ProductVariantQuerySet(models.QuerySet):
+    def with_stock(self):
+        """
+        Annotate variants with stock aggregates computed in SQL:
+            stock_quantity: biggest quantity available in a single location
+            stock_cost_price: cheapest cost price among the stock records
+                which have anything available
+            stock_cost_price_missing: 1 if any of those records has no
+                cost price, else 0
+            stock_in_stock: 1 if any location has available quantity, else 0
+        """
+        is_available = Q(stock__quantity__gt=F('stock__quantity_allocated'))
+        price_field = DecimalField(max_digits=12, decimal_places=2)
+        return self.annotate(
+            stock_quantity=Coalesce(
+                Max(Greatest(
+                    F('stock__quantity') - F('stock__quantity_allocated'),
+                    Value(0), output_field=IntegerField())),
+                Value(0), output_field=IntegerField()),
+            stock_cost_price=Min(Case(
+                When(is_available, then=F('stock__cost_price')),
+                output_field=price_field)),
+            stock_cost_price_missing=Max(Case(
+                When(is_available & Q(stock__cost_price__isnull=True),
+                     then=Value(1)),
+                default=Value(0), output_field=IntegerField())),
+            stock_in_stock=Max(Case(
+                When(is_available, then=Value(1)),
+                default=Value(0), output_field=IntegerField())))
 
 
 class ProductVariant(models.Model, Item):
@@ -271,18 +482,32 @@ class ProductVariant(models.Model, Item):
     attributes = HStoreField(default={})
     images = models.ManyToManyField('ProductImage', through='VariantImage')
 
+    objects = ProductVariantQuerySet.as_manager()
+
     def __str__(self):
         return self.name  # or self.display_variant()
 
+    def has_stock_annotations(self):
+        """
+        Whether variant was fetched with ProductVariantQuerySet.with_stock()
+        """
+        return hasattr(self, 'stock_in_stock')
+
     def check_quantity(self, quantity):
         available_quantity = self.get_stock_quantity()
         if quantity > available_quantity:
             raise InsufficientStock(self)
 
     def get_stock_quantity(self):
-        if not len(self.stock.all()):
+        if self.has_stock_annotations():
+            return self.stock_quantity
+        stock = self.stock.all()
+        if not stock:
             return 0
-        return max([stock.quantity_available for stock in self.stock.all()])
+        return max([stock_item.quantity_available for stock_item in stock])
+
+    def get_price_per_item(self, **kwargs):
+        return self.price_override or self.product.price
 
     # def get_price_per_item(self, discounts=None, **kwargs):
     #     price = self.price_override or self.product.price
@@ -307,8 +532,10 @@ class ProductVariant(models.Model, Item):
         return self.product.product_type.is_shipping_required
 
     def is_in_stock(self):
+        if self.has_stock_annotations():
+            return bool(self.stock_in_stock)
         return any(
-            [stock.quantity_available > 0 for stock in self.stock.all()])
+            stock.quantity_available > 0 for stock in self.stock.all())
 
     def get_attribute(self, pk):
         return self.attributes.get(smart_text(pk))
@@ -348,6 +575,13 @@ class ProductVariant(models.Model, Item):
             return stock[0]
 
     def get_cost_price(self):
+        if self.has_stock_annotations():
+            # missing cost price sorts as zero in select_stockrecord, so
+            # such a record is the cheapest one
+            if self.stock_cost_price_missing or self.stock_cost_price is None:
+                return None
+            return Price(
+                self.stock_cost_price, currency=settings.DEFAULT_CURRENCY)
         stock = self.select_stockrecord()
         if stock:
             return stock.cost_price
@@ -435,6 +669,71 @@ class AttributeChoiceValue(models.Model):
         return self.name
 
 
+class ProductImageQuerySet(models.QuerySet):
+    def assign_orders(self, product, images):
+        """
+        Set order of new images of product in memory, after existing ones
+        """
+        existing_max = self.filter(product=product).aggregate(
+            Max('order'))['order__max']
+        start = 0 if existing_max is None else existing_max + 1
+        for offset, image in enumerate(images):
+            image.product = product
+            image.order = start + offset
+        return images
+
+    def bulk_add(self, product, images):
+        """
+        Save many new images of product with one INSERT
+        Model signals are not sent by bulk_create, so renditions are
+        scheduled and product version is bumped here.
+        """
+        from .versions import invalidate_products
+
+        with transaction.atomic():
+            images = self.bulk_create(self.assign_orders(product, images))
+            renditions.schedule(
+                renditions.create_product_image_renditions,
+                [image.pk for image in images])
+        invalidate_products([product.pk])
+        return images
+
+    def reorder(self, product, image_ids):
+        """
+        Apply full ordering of product images given as list of their ids
+        with a single UPDATE ... FROM (VALUES ...) statement
+        """
+        from .versions import invalidate_products
+
+        image_ids = [int(pk) for pk in image_ids]
+        stored_ids = set(self.filter(product=product).values_list(
+            'pk', flat=True))
+        if len(image_ids) != len(stored_ids) or set(image_ids) != stored_ids:
+            raise ValueError(
+                'Ordering has to contain every image of product exactly once')
+        if not image_ids:
+            return
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+        values = ', '.join(['(%s, %s)'] * len(image_ids))
+        sql = (
+            'UPDATE {table} SET {order} = new.position '
+            'FROM (VALUES {values}) AS new (id, position) '
+            'WHERE {table}.{pk} = new.id AND {table}.{product} = %s').format(
+                table=qn(opts.db_table),
+                order=qn(opts.get_field('order').column),
+                pk=qn(opts.pk.column),
+                product=qn(opts.get_field('product').column),
+                values=values)
+        params = []
+        for position, pk in enumerate(image_ids):
+            params.extend([pk, position])
+        params.append(product.pk)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        invalidate_products([product.pk])
+
+
 class ProductImage(models.Model):
     product = models.ForeignKey(
         Product, related_name='images', on_delete=models.CASCADE)
@@ -443,6 +742,12 @@ class ProductImage(models.Model):
     ppoi = PPOIField()
     alt = models.CharField(max_length=128, blank=True)
     order = models.PositiveIntegerField(editable=False)
+    # names of rendition key sets generated for current image
+    renditions = ArrayField(
+        models.CharField(max_length=64), default=list, blank=True,
+        editable=False)
+
+    objects = ProductImageQuerySet.as_manager()
 
     class Meta:
         ordering = ('order', )
@@ -0,0 +1,115 @@
+"""
+Pre-generation of image renditions
+
+Product gallery images (VersatileImageField) are resized into rendition
+key sets named in settings.PRODUCT_IMAGE_RENDITION_SETS, catalog images
+(filer images of products.Product) into easy_thumbnails aliases named in
+settings.CATALOG_THUMBNAIL_ALIASES. Resizing runs in a process pool after
+upload and from the warm_renditions command; templates only build URLs of
+renditions that already exist (see product_images template tags).
+"""
+import multiprocessing
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from easy_thumbnails.alias import aliases
+from versatileimagefield.utils import get_rendition_key_set
+
+_pool = None
+
+
+def get_pool():
+    """
+    Workers are spawned, not forked, so they share no database or cache
+    connections with the web process, and set Django up on start
+    """
+    global _pool
+    if _pool is None:
+        context = multiprocessing.get_context('spawn')
+        _pool = context.Pool(
+            settings.RENDITION_WARMUP_WORKERS, initializer=django.setup)
+    return _pool
+
+
+def iter_renditions(image, set_name):
+    """Yields (key, sized image) of a VersatileImageField file"""
+    for key, spec in get_rendition_key_set(set_name):
+        sizer, size = spec.split('__')
+        yield key, getattr(image, sizer)[size]
+
+
+def create_product_image_renditions(image_ids, set_names=None):
+    """
+    Creates missing renditions of ProductImage objects and records
+    the warmed rendition sets. The UPDATE sends no signals, so tags of
+    products with new renditions are bumped here, cached pages linking
+    the original image are rendered again. Runs in a worker process.
+    """
+    from .models import ProductImage
+    from .versions import invalidate_products
+
+    set_names = set_names or settings.PRODUCT_IMAGE_RENDITION_SETS
+    warmed_images = 0
+    touched_ids = set()
+    for product_image in ProductImage.objects.filter(pk__in=image_ids):
+        product_image.image.create_on_demand = True
+        stored = set(product_image.renditions)
+        warmed = set(stored)
+        for set_name in set_names:
+            # with create_on_demand, looking sized image up creates its file
+            for _key, _sized_image in iter_renditions(
+                    product_image.image, set_name):
+                pass
+            warmed.add(set_name)
+        if warmed != stored:
+            ProductImage.objects.filter(pk=product_image.pk).update(
+                renditions=sorted(warmed))
+            touched_ids.add(product_image.product_id)
+        warmed_images += 1
+    if touched_ids:
+        invalidate_products(touched_ids)
+    return warmed_images
+
+
+def create_catalog_thumbnails(product_ids, alias_names=None):
+    """
+    Creates missing easy_thumbnails aliases of products.Product images,
+    existing thumbnails are recorded by easy_thumbnails itself.
+    updated_at of products with new thumbnails is touched, their tags
+    bumped (the UPDATE sends no signals) and featured products snapshot
+    dropped, so cached product cards and pages linking the original
+    image are rendered again.
+    Runs in a worker process.
+    """
+    from caching.tags import instance_tag, invalidate_tags
+    from products.featured import invalidate_featured_products
+    from products.models.product import Product
+
+    alias_names = alias_names or settings.CATALOG_THUMBNAIL_ALIASES
+    warmed_images = 0
+    touched_ids = []
+    products = Product.objects.filter(
+        pk__in=product_ids, image__isnull=False).select_related('image')
+    for product in products:
+        thumbnailer = product.image.easy_thumbnails_thumbnailer
+        for alias_name in alias_names:
+            options = aliases.get(alias_name)
+            if thumbnailer.get_existing_thumbnail(options) is None:
+                thumbnailer.get_thumbnail(options)
+                touched_ids.append(product.pk)
+        warmed_images += 1
+    if touched_ids:
+        Product.objects.filter(pk__in=touched_ids).update(
+            updated_at=timezone.now())
+        invalidate_tags(*[instance_tag(Product, pk) for pk in touched_ids])
+        invalidate_featured_products()
+    return warmed_images
+
+
+def schedule(function, ids):
+    """Submit warm up job once current transaction commits"""
+    ids = list(ids)
+    transaction.on_commit(
+        lambda: get_pool().apply_async(function, (ids,)))
@@ -0,0 +1,201 @@
+import django.dispatch
+from django.conf import settings
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_save)
+from django.dispatch import receiver
+from mptt.signals import node_moved
+
+from caching.tags import (
+    CATALOG_TAG, instance_tag, invalidate_tags, publish_model_tags)
+
+from . import renditions
+from .category_tree import CATEGORY_TREE_TAG, invalidate_category_tree
+from .models import (
+    Category, Product, ProductImage, ProductVariant, Stock, VariantImage)
+from .versions import invalidate_products, product_tag
+
+# sent after stock updates of a few rows which bypass model signals,
+# StockSynchronizer bumps product tags of its chunks itself
+stock_changed = django.dispatch.Signal(providing_args=['variant_ids'])
+
+
+def get_variant_product_tags(instance):
+    product_ids = ProductVariant.objects.filter(
+        pk=instance.variant_id).values_list('product_id', flat=True)
+    return [product_tag(product_id) for product_id in product_ids]
+
+
+# category tree snapshots of all processes are rebuilt
+publish_model_tags(
+    Category, lambda category: [CATEGORY_TREE_TAG], catalog=True)
+publish_model_tags(Product, catalog=True)
+# variants, stock and images are part of cached product documents,
+# listings show price ranges of variants only
+publish_model_tags(
+    ProductVariant, lambda variant: [product_tag(variant.product_id)],
+    catalog=True)
+publish_model_tags(
+    ProductImage, lambda image: [product_tag(image.product_id)])
+publish_model_tags(Stock, get_variant_product_tags)
+publish_model_tags(VariantImage, get_variant_product_tags)
+
+
+@receiver(post_init, sender=Category)
+@receiver(post_save, sender=Category)
+def category_tree_snapshot_receiver(sender, instance, **kwargs):
+    """Remember tree of category, MPTT moves leave no trace of the old one"""
+    instance._stored_tree_id = instance.__dict__.get('tree_id')
+
+
+@receiver(node_moved, sender=Category)
+def category_moved_receiver(sender, instance, **kwargs):
+    """
+    MPTT moves (move_to(), TreeManager.move_node()) rewrite tree fields
+    with raw UPDATEs without saving the node, so full paths of the moved
+    subtree and product counts of the trees it left and entered are
+    rebuilt here. Moves made by Category.save() are handled there.
+    """
+    if getattr(instance, '_is_saving', False):
+        return
+    category = Category.objects.select_related('parent').get(pk=instance.pk)
+    old_path = category.full_path
+    category.full_path = category.build_full_path()
+    if category.full_path != old_path:
+        Category.objects.filter(pk=category.pk).update(
+            full_path=category.full_path)
+        Category.objects.update_subtree_paths(category.pk, old_path)
+        instance.full_path = category.full_path
+    Category.objects.rebuild_tree_product_counts(
+        {instance._stored_tree_id, category.tree_id} - {None})
+    instance._stored_tree_id = category.tree_id
+    invalidate_category_tree()
+    # category URLs and counts of listings have changed
+    invalidate_tags(CATALOG_TAG, instance_tag(Category, category.pk))
+
+
+# denormalized into category counters and price ranges
+TRACKED_PRODUCT_FIELDS = ('category_id', 'is_published', 'price')
+
+
+def remember_stored_state(product):
+    # deferred fields are left out, reading them would query
+    product._stored_state = {}
+    if product.pk:
+        product._stored_state = {
+            attname: product.__dict__[attname]
+            for attname in TRACKED_PRODUCT_FIELDS
+            if attname in product.__dict__}
+
+
+def get_changed_fields(product, created, update_fields):
+    """Tracked fields written by the save with value other than loaded"""
+    if created:
+        return set(TRACKED_PRODUCT_FIELDS)
+    changed = set()
+    for attname in TRACKED_PRODUCT_FIELDS:
+        name = attname[:-len('_id')] if attname.endswith('_id') else attname
+        if update_fields is not None and name not in update_fields:
+            continue
+        stored = product._stored_state
+        if attname in stored and stored[attname] != getattr(product, attname):
+            changed.add(attname)
+    return changed
+
+
+@receiver(post_init, sender=Product)
+def product_post_init_receiver(sender, instance, **kwargs):
+    """
+    Remember loaded state of tracked fields, so saves compare against it
+    instead of reading the stored row again
+    """
+    remember_stored_state(instance)
+
+
+@receiver(pre_save, sender=Product)
+def product_pre_save_receiver(sender, instance, **kwargs):
+    """Tracked fields loaded deferred and assigned since are read (rare)"""
+    stored = instance._stored_state
+    missing = [
+        attname for attname in TRACKED_PRODUCT_FIELDS
+        if attname not in stored and attname in instance.__dict__]
+    if instance.pk and missing:
+        stored.update(Product.objects.filter(pk=instance.pk).values(
+            *missing).first() or {})
+
+
+@receiver(post_save, sender=Product)
+def product_save_receiver(sender, instance, created, **kwargs):
+    """Every product gets a default variant"""
+    if not instance.variants.exists():
+        ProductVariant.objects.create(
+            product=instance, name='Default',
+            sku='{} - {} - default'.format(instance.id, instance.name))
+
+
+@receiver(post_save, sender=Product)
+def product_post_save_receiver(
+        sender, instance, created, update_fields, **kwargs):
+    """
+    Move product between category counters when its category or publish
+    state has changed, recompute price range when its price has changed
+    """
+    stored = instance._stored_state
+    changed = get_changed_fields(instance, created, update_fields)
+    # price range of a new product follows its default variant, set by
+    # variant_changed_receiver
+    if 'price' in changed and not created:
+        instance.update_price_range()
+    if changed & {'category_id', 'is_published'}:
+        if stored.get('is_published'):
+            Category.objects.adjust_product_count(stored['category_id'], -1)
+        if instance.is_published:
+            Category.objects.adjust_product_count(instance.category_id, 1)
+        invalidate_category_tree()
+    remember_stored_state(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_post_delete_receiver(sender, instance, **kwargs):
+    if instance.is_published:
+        Category.objects.adjust_product_count(instance.category_id, -1)
+        invalidate_category_tree()
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def variant_changed_receiver(sender, instance, **kwargs):
+    """Price range of product depends on prices of all its variants"""
+    # default variant of a new product holds the instance being saved
+    cache_name = ProductVariant._meta.get_field('product').get_cache_name()
+    product = getattr(instance, cache_name, None)
+    if product is None:
+        product = Product.objects.filter(pk=instance.product_id).first()
+    if product is not None:
+        product.update_price_range()
+
+
+@receiver(pre_save, sender=ProductImage)
+def product_image_pre_save_receiver(sender, instance, **kwargs):
+    """Renditions of replaced image file are not valid anymore"""
+    if instance.pk:
+        stored_name = ProductImage.objects.filter(pk=instance.pk).values_list(
+            'image', flat=True).first()
+        if stored_name != instance.image.name:
+            instance.renditions = []
+
+
+@receiver(post_save, sender=ProductImage)
+def product_image_post_save_receiver(sender, instance, **kwargs):
+    """Generate missing renditions in background"""
+    missing = (
+        set(settings.PRODUCT_IMAGE_RENDITION_SETS) - set(instance.renditions))
+    if missing:
+        renditions.schedule(
+            renditions.create_product_image_renditions, [instance.pk])
+
+
+@receiver(stock_changed)
+def stock_changed_receiver(sender, variant_ids, **kwargs):
+    product_ids = ProductVariant.objects.filter(
+        pk__in=variant_ids).values_list('product_id', flat=True).distinct()
+    invalidate_products(product_ids)
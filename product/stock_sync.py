@@ -0,0 +1,119 @@
+import time
+
+from django.db import connection, transaction
+from django.utils.encoding import smart_text
+from psycopg2.extras import execute_values
+
+from .importers import chunked
+from .models import ProductVariant, Stock
+from .versions import invalidate_products
+
+UPSERT_SQL = '''
+    INSERT INTO {table} ({variant}, {location}, {quantity}, {allocated})
+    VALUES %s
+    ON CONFLICT ({variant}, {location})
+    DO UPDATE SET {quantity} = EXCLUDED.{quantity}
+'''
+
+
+class StockSynchronizer(object):
+    """
+    Applies full stock snapshot of a single stock location
+
+    Rows ({'sku': ..., 'quantity': ...}) are processed in chunks: variants
+    and their current quantities are loaded per chunk and only rows with
+    a different quantity are written, with one INSERT ... ON CONFLICT
+    statement per chunk. Stock of variants missing in the snapshot is set
+    to zero, unless zero_missing is False. Tags of products with changed
+    stock are bumped per chunk too, the statements send no signals.
+    """
+
+    def __init__(self, location, chunk_size=10000, zero_missing=True):
+        self.location = location
+        self.chunk_size = chunk_size
+        self.zero_missing = zero_missing
+        self.rows = 0
+        self.unknown_skus = 0
+        self.invalid_rows = 0
+        self.seen_variant_ids = set()
+        self.changed_variant_ids = set()
+        self.started = None
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.time() - (self.started or time.time())
+        return self.rows / elapsed if elapsed else 0.0
+
+    def run(self, rows, callback=None):
+        self.started = time.time()
+        for chunk in chunked(rows, self.chunk_size):
+            self.sync_chunk(chunk)
+            if callback is not None:
+                callback(self)
+        if self.zero_missing:
+            self.zero_missing_stock()
+        return self.changed_variant_ids
+
+    def parse_chunk(self, rows):
+        quantities = {}
+        for row in rows:
+            sku = smart_text(row.get('sku') or '').strip()
+            try:
+                quantity = int(row.get('quantity'))
+            except (TypeError, ValueError):
+                quantity = -1
+            if not sku or quantity < 0:
+                self.invalid_rows += 1
+                continue
+            # later rows of the snapshot win
+            quantities[sku] = quantity
+        return quantities
+
+    def sync_chunk(self, rows):
+        self.rows += len(rows)
+        quantities = self.parse_chunk(rows)
+        variants = {
+            sku: (variant_id, product_id)
+            for sku, variant_id, product_id in ProductVariant.objects.filter(
+                sku__in=quantities).values_list('sku', 'pk', 'product_id')}
+        self.unknown_skus += len(quantities) - len(variants)
+        current = dict(Stock.objects.filter(
+            location=self.location,
+            variant_id__in=[v for v, _p in variants.values()]).values_list(
+                'variant_id', 'quantity'))
+        changes = []
+        product_ids = set()
+        for sku, (variant_id, product_id) in variants.items():
+            self.seen_variant_ids.add(variant_id)
+            quantity = quantities[sku]
+            if current.get(variant_id) != quantity:
+                changes.append((variant_id, self.location.pk, quantity, 0))
+                self.changed_variant_ids.add(variant_id)
+                product_ids.add(product_id)
+        if changes:
+            self.upsert(changes)
+            invalidate_products(product_ids)
+
+    def upsert(self, changes):
+        opts = Stock._meta
+        sql = UPSERT_SQL.format(
+            table=connection.ops.quote_name(opts.db_table),
+            variant=opts.get_field('variant').column,
+            location=opts.get_field('location').column,
+            quantity=opts.get_field('quantity').column,
+            allocated=opts.get_field('quantity_allocated').column)
+        with transaction.atomic(), connection.cursor() as cursor:
+            execute_values(cursor.cursor, sql, changes, page_size=1000)
+
+    def zero_missing_stock(self):
+        stock = Stock.objects.filter(
+            location=self.location, quantity__gt=0).values_list(
+                'pk', 'variant_id', 'variant__product_id')
+        missing = (
+            row for row in stock.iterator()
+            if row[1] not in self.seen_variant_ids)
+        for chunk in chunked(missing, self.chunk_size):
+            Stock.objects.filter(pk__in=[pk for pk, _v, _p in chunk]).update(
+                quantity=0)
+            self.changed_variant_ids.update(v for _pk, v, _p in chunk)
+            invalidate_products({p for _pk, _v, p in chunk})
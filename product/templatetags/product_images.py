@@ -0,0 +1,62 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.utils.encoding import force_bytes
+from easy_thumbnails.alias import aliases
+
+from ..renditions import iter_renditions
+
+register = template.Library()
+
+THUMBNAIL_URL_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def get_thumbnail_url_cache_key(image, alias_name):
+    # replaced file of the image gets thumbnails of its own name
+    name = '%s|%s' % (image.file.name, alias_name)
+    return 'thumbnail-url:%s' % hashlib.md5(force_bytes(name)).hexdigest()
+
+
+@register.simple_tag
+def rendition_url(product_image, set_name, key):
+    """
+    Usage:
+        {% load product_images %}
+        <img src="{% rendition_url image 'product_gallery' 'gallery' %}">
+
+    Returns URL of pre-generated rendition of ProductImage, or URL of
+    the original image while renditions are not generated yet
+    """
+    if set_name in product_image.renditions:
+        for rendition_key, sized_image in iter_renditions(
+                product_image.image, set_name):
+            if rendition_key == key:
+                return sized_image.url
+    return product_image.image.url
+
+
+@register.simple_tag
+def thumbnail_alias_url(image, alias_name):
+    """
+    Usage:
+        {% load product_images %}
+        <img src="{% thumbnail_alias_url product.image 'product_list' %}">
+
+    Returns URL of existing easy_thumbnails alias of filer image, or URL of
+    the original image, thumbnails are never generated while rendering.
+    URLs of existing thumbnails are cached, so the storage is checked
+    only until the thumbnail is generated.
+    """
+    if not image:
+        return ''
+    key = get_thumbnail_url_cache_key(image, alias_name)
+    url = cache.get(key)
+    if url is not None:
+        return url
+    thumbnailer = image.easy_thumbnails_thumbnailer
+    thumbnail = thumbnailer.get_existing_thumbnail(aliases.get(alias_name))
+    if thumbnail is None:
+        return image.url
+    cache.set(key, thumbnail.url, THUMBNAIL_URL_CACHE_TIMEOUT)
+    return thumbnail.url
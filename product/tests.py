@@ -1,3 +1,612 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+from django_prices.models import Price
+
+from caching.tags import CATALOG_TAG, get_tag_version
+
+from . import renditions
+from .category_tree import get_category_tree
+from .importers import ProductImporter, read_rows
+from .signals import stock_changed
+from .stock_sync import StockSynchronizer
+from .variant_picker import get_variant_picker_data
+from .versions import get_product_version
+from .models import (
+    AttributeChoiceValue, Category, Collection, Product, ProductAttribute,
+    ProductImage, ProductType, ProductVariant, Stock, StockLocation)
+
+
+def price(amount):
+    return Price(amount, currency=settings.DEFAULT_CURRENCY)
+
+
+class VariantStockTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Clothes', slug='clothes')
+        cls.product_type = ProductType.objects.create(name='T-shirt')
+        cls.product = Product.objects.create(
+            product_type=cls.product_type,
+            category=cls.category,
+            name='Test T-shirt',
+            description='Lorem ipsum',
+            price=price(10))
+        # product_save_receiver has created the default variant
+        cls.variant = cls.product.variants.get()
+        cls.empty_variant = ProductVariant.objects.create(
+            product=cls.product, sku='EMPTY', name='Empty')
+
+        first_location = StockLocation.objects.create(name='First')
+        second_location = StockLocation.objects.create(name='Second')
+        Stock.objects.create(
+            variant=cls.variant, location=first_location,
+            quantity=5, quantity_allocated=1, cost_price=price(7))
+        Stock.objects.create(
+            variant=cls.variant, location=second_location,
+            quantity=3, quantity_allocated=0, cost_price=price(4))
+        Stock.objects.create(
+            variant=cls.empty_variant, location=first_location,
+            quantity=2, quantity_allocated=2, cost_price=price(1))
+
+    def test_with_stock_matches_python_computation(self):
+        annotated = ProductVariant.objects.with_stock().get(pk=self.variant.pk)
+        self.assertEqual(annotated.get_stock_quantity(), 4)
+        self.assertEqual(
+            annotated.get_stock_quantity(), self.variant.get_stock_quantity())
+        self.assertTrue(annotated.is_in_stock())
+        self.assertEqual(annotated.get_cost_price(), price(4))
+        self.assertEqual(
+            annotated.get_cost_price(), self.variant.get_cost_price())
+
+    def test_with_stock_for_variant_without_available_stock(self):
+        annotated = ProductVariant.objects.with_stock().get(
+            pk=self.empty_variant.pk)
+        self.assertEqual(annotated.get_stock_quantity(), 0)
+        self.assertFalse(annotated.is_in_stock())
+        self.assertIsNone(annotated.get_cost_price())
+
+    def test_with_stock_keeps_zero_and_missing_cost_prices_apart(self):
+        location = StockLocation.objects.get(name='Second')
+        free_variant = ProductVariant.objects.create(
+            product=self.product, sku='FREE', name='Free')
+        Stock.objects.create(
+            variant=free_variant, location=location,
+            quantity=1, cost_price=price(0))
+        Stock.objects.create(
+            variant=self.empty_variant, location=location, quantity=1)
+        for variant in (free_variant, self.empty_variant):
+            annotated = ProductVariant.objects.with_stock().get(pk=variant.pk)
+            self.assertEqual(
+                annotated.get_cost_price(), variant.get_cost_price())
+        self.assertEqual(free_variant.get_cost_price(), price(0))
+
+    def test_product_stock_checks_use_single_prefetch(self):
+        with self.assertNumQueries(2):
+            product = Product.objects.with_variant_stock().get(
+                pk=self.product.pk)
+            self.assertTrue(product.is_in_stock())
+            self.assertEqual(
+                sorted(v.get_stock_quantity() for v in product), [0, 4])
+
+
+class CategoryPathTest(TestCase):
+    def setUp(self):
+        self.root = Category.objects.create(name='Clothes', slug='clothes')
+        self.child = Category.objects.create(
+            name='Shirts', slug='shirts', parent=self.root)
+        self.grandchild = Category.objects.create(
+            name='Polo', slug='polo', parent=self.child)
+
+    def test_full_path_is_stored(self):
+        self.assertEqual(self.grandchild.full_path, 'clothes/shirts/polo')
+        self.assertEqual(
+            Category.objects.by_path('clothes/shirts').get(), self.child)
+
+    def test_absolute_url_does_not_query(self):
+        category = Category.objects.get(pk=self.grandchild.pk)
+        with self.assertNumQueries(0):
+            url = category.get_absolute_url()
+        self.assertIn('clothes/shirts/polo', url)
+
+    def test_rename_updates_descendants(self):
+        root = Category.objects.get(pk=self.root.pk)
+        root.slug = 'apparel'
+        root.save()
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.full_path, 'apparel/shirts/polo')
+
+    def test_move_updates_descendants(self):
+        other = Category.objects.create(name='Sale', slug='sale')
+        child = Category.objects.get(pk=self.child.pk)
+        child.move_to(other)
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.full_path, 'sale/shirts/polo')
+        child.refresh_from_db()
+        self.assertEqual(child.full_path, 'sale/shirts')
+
+    def test_reparent_on_save_updates_descendants(self):
+        other = Category.objects.create(name='Sale', slug='summer-sale')
+        child = Category.objects.get(pk=self.child.pk)
+        child.parent = other
+        child.save()
+        self.grandchild.refresh_from_db()
+        self.assertEqual(
+            self.grandchild.full_path, 'summer-sale/shirts/polo')
+        child.refresh_from_db()
+        self.assertEqual(child.full_path, 'summer-sale/shirts')
+
+    def test_rename_leaves_other_tree_with_same_path_alone(self):
+        # slugs are not unique, so neither are full paths
+        other_root = Category.objects.create(name='Clothes', slug='clothes')
+        other_child = Category.objects.create(
+            name='Shirts', slug='shirts', parent=other_root)
+        root = Category.objects.get(pk=self.root.pk)
+        root.slug = 'apparel'
+        root.save()
+        other_child.refresh_from_db()
+        self.assertEqual(other_child.full_path, 'clothes/shirts')
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.full_path, 'apparel/shirts/polo')
+
+    def test_save_of_stale_instance_rewrites_stored_paths(self):
+        stale_child = Category.objects.get(pk=self.child.pk)
+        root = Category.objects.get(pk=self.root.pk)
+        root.slug = 'apparel'
+        root.save()
+        stale_child.slug = 'tees'
+        stale_child.save()
+        self.grandchild.refresh_from_db()
+        self.assertEqual(self.grandchild.full_path, 'apparel/tees/polo')
+
+
+class CategoryTreeSnapshotTest(TestCase):
+    def setUp(self):
+        self.root = Category.objects.create(name='Clothes', slug='clothes')
+        self.child = Category.objects.create(
+            name='Shirts', slug='shirts', parent=self.root)
+        self.grandchild = Category.objects.create(
+            name='Polo', slug='polo', parent=self.child)
+        self.other = Category.objects.create(name='Shoes', slug='shoes')
+
+    def test_descendants(self):
+        tree = get_category_tree()
+        self.assertEqual(
+            tree.descendant_ids(self.root.pk),
+            [self.root.pk, self.child.pk, self.grandchild.pk])
+        self.assertEqual(
+            tree.descendant_ids(self.child.pk, include_self=False),
+            [self.grandchild.pk])
+        self.assertEqual(tree.get(self.grandchild.pk).full_path,
+                         'clothes/shirts/polo')
+
+    def test_snapshot_is_reused_until_category_is_saved(self):
+        tree = get_category_tree()
+        with self.assertNumQueries(0):
+            self.assertIs(get_category_tree(), tree)
+        Category.objects.create(name='Sale', slug='sale')
+        new_tree = get_category_tree()
+        self.assertIsNot(new_tree, tree)
+        self.assertEqual(len(new_tree), len(tree) + 1)
+
+
+class CategoryProductCountTest(TestCase):
+    def setUp(self):
+        self.root = Category.objects.create(name='Clothes', slug='clothes')
+        self.child = Category.objects.create(
+            name='Shirts', slug='shirts', parent=self.root)
+        self.other = Category.objects.create(name='Shoes', slug='shoes')
+        self.product_type = ProductType.objects.create(name='T-shirt')
+
+    def create_product(self, category, **kwargs):
+        return Product.objects.create(
+            product_type=self.product_type, category=category,
+            name='Test product', description='Lorem ipsum', price=price(10),
+            **kwargs)
+
+    def assertCounts(self, category, count, total):
+        category.refresh_from_db()
+        self.assertEqual(
+            (category.product_count, category.total_product_count),
+            (count, total))
+
+    def test_counts_follow_product_changes(self):
+        product = self.create_product(self.child)
+        self.create_product(self.root)
+        self.create_product(self.root, is_published=False)
+        self.assertCounts(self.child, 1, 1)
+        self.assertCounts(self.root, 1, 2)
+
+        product.category = self.other
+        product.save()
+        self.assertCounts(self.child, 0, 0)
+        self.assertCounts(self.root, 1, 1)
+        self.assertCounts(self.other, 1, 1)
+
+        product.delete()
+        self.assertCounts(self.other, 0, 0)
+
+    def test_counts_follow_category_moves(self):
+        self.create_product(self.child)
+        self.create_product(self.child)
+        child = Category.objects.get(pk=self.child.pk)
+        child.move_to(self.other)
+        self.assertCounts(self.root, 0, 0)
+        self.assertCounts(self.other, 0, 2)
+        self.assertCounts(self.child, 2, 2)
+
+        child = Category.objects.get(pk=self.child.pk)
+        child.parent = self.root
+        child.save()
+        self.assertCounts(self.root, 0, 2)
+        self.assertCounts(self.other, 0, 0)
+
+    def test_category_moves_rebuild_only_trees_involved(self):
+        # full paths are not unique, an unrelated tree shares them
+        other_root = Category.objects.create(name='Clothes', slug='clothes')
+        self.create_product(other_root)
+        Category.objects.filter(pk=other_root.pk).update(product_count=5)
+        self.create_product(self.child)
+        child = Category.objects.get(pk=self.child.pk)
+        child.move_to(self.other)
+        self.assertCounts(self.root, 0, 0)
+        self.assertCounts(self.other, 0, 1)
+        self.assertCounts(other_root, 5, 1)
+
+    def test_rebuild(self):
+        self.create_product(self.child)
+        self.create_product(self.child)
+        Category.objects.update(product_count=0, total_product_count=0)
+        self.assertEqual(Category.objects.rebuild_product_counts(), 2)
+        self.assertCounts(self.child, 2, 2)
+        self.assertCounts(self.root, 0, 2)
+        self.assertCounts(self.other, 0, 0)
+
+
+class ProductSlugTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Clothes', slug='clothes')
+        product_type = ProductType.objects.create(name='T-shirt')
+        self.product = Product.objects.create(
+            product_type=product_type, category=category,
+            name='Žluťoučký kůň', description='Lorem ipsum', price=price(10))
+
+    def test_slug_is_stored_and_follows_name(self):
+        self.assertEqual(self.product.slug, 'zlutoucky-kun')
+        self.product.name = 'Blue shirt'
+        self.product.save(update_fields=['name'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.slug, 'blue-shirt')
+
+    def test_absolute_url_uses_stored_slug(self):
+        product = Product.objects.get(pk=self.product.pk)
+        product.name = 'Changed but not saved'
+        self.assertIn('zlutoucky-kun', product.get_absolute_url())
+
+
+class ProductImporterTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Clothes', slug='clothes')
+        ProductType.objects.create(name='T-shirt')
+        color = ProductAttribute.objects.create(slug='color', name='Color')
+        self.red = AttributeChoiceValue.objects.create(
+            name='Red', slug='red', attribute=color)
+        StockLocation.objects.create(name='Main')
+        self.collection = Collection.objects.create(
+            name='Summer', slug='summer')
+
+    def import_rows(self, rows):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.jsonl', delete=False) as stream:
+            for row in rows:
+                stream.write(json.dumps(row) + '\n')
+        self.addCleanup(os.remove, stream.name)
+        importer = ProductImporter(chunk_size=2)
+        importer.run(read_rows(stream.name))
+        return importer
+
+    def test_import(self):
+        importer = self.import_rows([
+            {'name': 'Red shirt', 'product_type': 't-shirt',
+             'category': 'clothes', 'price': '10.00',
+             'attributes': {'color': 'red'}, 'collections': ['summer'],
+             'variants': [{'sku': 'RED-1', 'stock': [
+                 {'location': 'Main', 'quantity': 3}]}]},
+            {'name': 'Plain shirt', 'product_type': 'T-shirt',
+             'category': str(self.category.pk), 'price': '8.00',
+             'variants': []},
+            {'name': 'Broken', 'product_type': 'Unknown',
+             'category': 'clothes', 'price': '1.00', 'variants': []}])
+        self.assertEqual(importer.imported, 2)
+        self.assertEqual(importer.errors[0][0], 3)
+
+        product = Product.objects.get(name='Red shirt')
+        self.assertEqual(product.slug, 'red-shirt')
+        self.assertEqual(product.get_attribute(self.red.attribute_id),
+                         str(self.red.pk))
+        self.assertEqual(list(product.collections.all()), [self.collection])
+        variant = product.variants.get()
+        self.assertEqual(variant.get_stock_quantity(), 3)
+        self.assertEqual(
+            Product.objects.get(name='Plain shirt').variants.get().name,
+            'Default')
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.total_product_count, 2)
+
+
+class StockSynchronizerTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Clothes', slug='clothes')
+        product_type = ProductType.objects.create(name='T-shirt')
+        product = Product.objects.create(
+            product_type=product_type, category=category,
+            name='Test product', description='Lorem ipsum', price=price(10))
+        self.first = ProductVariant.objects.create(product=product, sku='A')
+        self.second = ProductVariant.objects.create(product=product, sku='B')
+        self.third = ProductVariant.objects.create(product=product, sku='C')
+        self.location = StockLocation.objects.create(name='Main')
+        Stock.objects.create(
+            variant=self.first, location=self.location, quantity=5)
+        Stock.objects.create(
+            variant=self.third, location=self.location, quantity=2)
+
+    def test_only_changed_rows_are_written(self):
+        product_version = get_product_version(self.first.product_id)
+        synchronizer = StockSynchronizer(self.location, chunk_size=2)
+        changed = synchronizer.run([
+            {'sku': 'A', 'quantity': '5'},
+            {'sku': 'B', 'quantity': '7'},
+            {'sku': 'UNKNOWN', 'quantity': '1'}])
+
+        self.assertEqual(changed, {self.second.pk, self.third.pk})
+        self.assertNotEqual(
+            get_product_version(self.first.product_id), product_version)
+        self.assertEqual(synchronizer.unknown_skus, 1)
+        quantities = dict(Stock.objects.filter(
+            location=self.location).values_list('variant__sku', 'quantity'))
+        self.assertEqual(quantities, {'A': 5, 'B': 7, 'C': 0})
+
+
+class ProductImageOrderTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Clothes', slug='clothes')
+        product_type = ProductType.objects.create(name='T-shirt')
+        self.product = Product.objects.create(
+            product_type=product_type, category=category,
+            name='Test product', description='Lorem ipsum', price=price(10))
+        self.images = ProductImage.objects.bulk_add(self.product, [
+            ProductImage(image='products/%d.jpg' % i) for i in range(3)])
+
+    def test_bulk_add_assigns_orders(self):
+        self.assertEqual([image.order for image in self.images], [0, 1, 2])
+        more = ProductImage.objects.bulk_add(
+            self.product, [ProductImage(image='products/3.jpg')])
+        self.assertEqual(more[0].order, 3)
+
+    def test_reorder_uses_single_update(self):
+        first, second, third = [image.pk for image in self.images]
+        with self.assertNumQueries(2):
+            ProductImage.objects.reorder(self.product, [third, first, second])
+        self.assertEqual(
+            list(self.product.images.values_list('pk', flat=True)),
+            [third, first, second])
+
+    def test_new_renditions_purge_product_pages(self):
+        version = get_product_version(self.product.pk)
+        with mock.patch.object(renditions, 'iter_renditions', return_value=[]):
+            renditions.create_product_image_renditions([self.images[0].pk])
+        self.images[0].refresh_from_db()
+        self.assertEqual(
+            self.images[0].renditions,
+            sorted(settings.PRODUCT_IMAGE_RENDITION_SETS))
+        self.assertNotEqual(get_product_version(self.product.pk), version)
+
+    def test_reorder_requires_all_images(self):
+        with self.assertRaises(ValueError):
+            ProductImage.objects.reorder(self.product, [self.images[0].pk])
+
+
+class ProductPriceRangeTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Clothes', slug='clothes')
+        product_type = ProductType.objects.create(name='T-shirt')
+        self.product = Product.objects.create(
+            product_type=product_type, category=category,
+            name='Test product', description='Lorem ipsum', price=price(10))
+
+    def assertPriceRange(self, min_amount, max_amount):
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(
+            (product.min_price, product.max_price),
+            (price(min_amount), price(max_amount)))
+
+    def test_price_range_follows_variants_and_product_price(self):
+        # default variant uses product price
+        self.assertPriceRange(10, 10)
+        variant = ProductVariant.objects.create(
+            product=self.product, sku='EXPENSIVE', price_override=price(25))
+        self.assertPriceRange(10, 25)
+
+        self.product.price = price(5)
+        self.product.save()
+        self.assertPriceRange(5, 25)
+
+        variant.delete()
+        self.assertPriceRange(5, 5)
+
+    def test_new_product_price_range_is_set_once(self):
+        self.assertEqual(
+            (self.product.min_price, self.product.max_price),
+            (price(10), price(10)))
+        product = Product.objects.get(pk=self.product.pk)
+        product.name = 'Renamed product'
+        # UPDATE and the default variant check, stored row is not read
+        with self.assertNumQueries(2):
+            product.save()
+
+    def test_gross_price_range_uses_stored_columns(self):
+        product = Product.objects.get(pk=self.product.pk)
+        with self.assertNumQueries(0):
+            price_range = product.get_gross_price_range()
+        self.assertEqual(price_range.min_price, price(10))
+
+
+class VariantPickerTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Clothes', slug='clothes')
+        self.size = ProductAttribute.objects.create(slug='size', name='Size')
+        self.small = AttributeChoiceValue.objects.create(
+            attribute=self.size, name='S', slug='s')
+        AttributeChoiceValue.objects.create(
+            attribute=self.size, name='XXL', slug='xxl')
+        product_type = ProductType.objects.create(name='T-shirt')
+        product_type.variant_attributes.add(self.size)
+        self.product = Product.objects.create(
+            product_type=product_type, category=category,
+            name='Test product', description='Lorem ipsum', price=price(10))
+        self.variant = self.product.variants.get()
+        self.variant.set_attribute(self.size.pk, self.small.pk)
+        self.variant.save()
+
+    def test_document_lists_used_attribute_values(self):
+        data = get_variant_picker_data(self.product.pk)
+        self.assertTrue(data['showPicker'])
+        self.assertEqual(
+            [value['slug'] for value in data['attributes'][0]['values']],
+            ['s'])
+        variant_data, = data['variants']
+        self.assertEqual(variant_data['id'], self.variant.pk)
+        self.assertFalse(variant_data['inStock'])
+
+    def test_picker_flag_of_product_without_variants(self):
+        # as all() of the variants computed by the details view before
+        self.variant.delete()
+        data = get_variant_picker_data(self.product.pk)
+        self.assertTrue(data['showPicker'])
+        self.assertEqual(data['variants'], [])
+
+    def test_document_is_cached_until_stock_changes(self):
+        get_variant_picker_data(self.product.pk)
+        with self.assertNumQueries(0):
+            get_variant_picker_data(self.product.pk)
+        location = StockLocation.objects.create(name='Warehouse')
+        Stock.objects.create(
+            variant=self.variant, location=location, quantity=3)
+        data = get_variant_picker_data(self.product.pk)
+        self.assertTrue(data['variants'][0]['inStock'])
+
+    def test_stock_changes_do_not_purge_listings(self):
+        catalog_version = get_tag_version(CATALOG_TAG)
+        product_version = get_product_version(self.product.pk)
+        location = StockLocation.objects.create(name='Warehouse')
+        Stock.objects.create(
+            variant=self.variant, location=location, quantity=3)
+        stock_changed.send(sender=Stock, variant_ids=[self.variant.pk])
+        self.assertEqual(get_tag_version(CATALOG_TAG), catalog_version)
+        self.assertNotEqual(
+            get_product_version(self.product.pk), product_version)
+
+    def test_endpoint(self):
+        url = reverse('product:variants', kwargs={
+            'product_id': self.product.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['productId'], self.product.pk)
+
+
+@override_settings(PAGE_CACHE_URL_NAMES=[])
+class ProductDetailsQueriesTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Clothes', slug='clothes')
+        color = ProductAttribute.objects.create(slug='color', name='Color')
+        red = AttributeChoiceValue.objects.create(
+            attribute=color, name='Red', slug='red')
+        product_type = ProductType.objects.create(name='T-shirt')
+        product_type.product_attributes.add(color)
+        self.product = Product.objects.create(
+            product_type=product_type, category=category,
+            name='Test product', description='Lorem ipsum', price=price(10),
+            attributes={str(color.pk): str(red.pk)})
+        for number in range(3):
+            ProductVariant.objects.create(
+                product=self.product, sku='SKU-%s' % number)
+
+    def test_details_page_query_budget(self):
+        url = self.product.get_absolute_url()
+        # warm up variant picker document
+        get_variant_picker_data(self.product.pk)
+        # product with type and category, images, attributes, values
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Red')
+        self.assertContains(response, 'application/ld+json')
+
+    def test_cached_fragments(self):
+        url = self.product.get_absolute_url()
+        self.client.get(url)
+        # only the product itself
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, 'Lorem ipsum')
+
+        self.product.description = 'Dolor sit amet'
+        self.product.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Dolor sit amet')
+
+    def test_category_rename_renders_fragments_again(self):
+        url = self.product.get_absolute_url()
+        self.client.get(url)
+        category = self.product.category
+        category.name = 'Apparel'
+        category.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Apparel')
+
+    def test_parent_rename_renders_category_url_again(self):
+        root = Category.objects.create(name='Sale', slug='sale')
+        product = self.product
+        product.category.parent = root
+        product.category.save()
+        url = product.get_absolute_url()
+        self.client.get(url)
+        root.slug = 'summer-sale'
+        root.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'summer-sale/clothes')
+
+    def test_staff_preview_is_not_served_to_public(self):
+        location = StockLocation.objects.create(name='Warehouse')
+        Stock.objects.create(
+            variant=self.product.variants.first(), location=location,
+            quantity=3)
+        Product.objects.filter(pk=self.product.pk).update(
+            available_on=datetime.date.today() + datetime.timedelta(days=1))
+        staff = get_user_model().objects.create_superuser(
+            'staff@example.com', 'password')
+        self.client.force_login(staff)
+        url = self.product.get_absolute_url()
+        self.assertNotContains(self.client.get(url), 'InStock')
+        # the product became available, nothing was saved
+        Product.objects.filter(pk=self.product.pk).update(available_on=None)
+        self.client.logout()
+        self.assertContains(self.client.get(url), 'InStock')
+
+    def test_products_of_other_pages_do_not_purge_fragments(self):
+        url = self.product.get_absolute_url()
+        self.client.get(url)
+        # moves the category counters
+        Product.objects.create(
+            product_type=self.product.product_type,
+            category=self.product.category, name='Other product',
+            description='Lorem ipsum', price=price(10))
+        with self.assertNumQueries(1):
+            self.client.get(url)
@@ -4,6 +4,7 @@ from six import iteritems
 
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.db.models import prefetch_related_objects
 from django.utils.encoding import smart_text
 from django_prices.templatetags import prices_i18n
 
@@ -28,7 +29,7 @@ def products_visible_to_user(user):
     if user.is_authenticated and user.is_active and user.is_staff:
         return Product.objects.all()
     else:
-        return Product.objects.get_available_products()
+        return Product.objects.available_products()
 
 
 def products_with_details(user):
@@ -37,24 +38,35 @@ def products_with_details(user):
     :param user: User instance
     :return: Products queryset
     """
-    products = products_visible_to_user(user)
+    products = products_visible_to_user(user).with_variant_stock()
     products = products.prefetch_related(
-        'category', 'images', 'variants__stock',
-        'variants__variant_images__image', 'attributes__values',
+        'category', 'images', 'variants__variant_images__image',
+        'attributes__values',
         'product_type__variant_attributes__values',
         'product_type__product_attributes__values')
     return products
 
 
-def products_for_homepage():
+def products_for_details(user):
     """
-    Returns products to display on home page (featured)
+    Returns products with relations of product details page joined,
+    everything else the page uses is loaded by prefetch_product_details()
+    only when the page fragments are not cached.
+    :param user: User instance
     :return: Products queryset
     """
-    user = AnonymousUser()
-    products = products_with_details(user)
-    products = products.filter(is_featured=True)
-    return products
+    return products_visible_to_user(user).select_related(
+        'product_type', 'category')
+
+
+def prefetch_product_details(product):
+    """
+    Prefetches images and product attributes with their values,
+    two or three queries on the first call, none on later calls
+    """
+    prefetch_related_objects(
+        [product], 'images', 'product_type__product_attributes__values')
+    return product
 
 
 def get_product_images(product):
@@ -65,12 +77,10 @@ def get_product_images(product):
 
 
 def products_for_api(user):
-    products = products_visible_to_user(user)
+    products = products_visible_to_user(user).with_variant_stock()
     return products.prefetch_related(
         'images',
-        'categories',
-        'variants',
-        'variants__stock')
+        'categories')
 
 
 # def handle_cart_form(request, product, create_cart=False):
@@ -95,6 +105,10 @@ def products_for_cart(user):
     return products
 
 
+ProductAvailability = namedtuple(
+    'ProductAvailability', ('available', 'price_range'))
+
+
 def product_json_ld(product, availability=None, attributes=None):
     # type: (saleor.product.models.Product, saleor.product.utils.ProductAvailability, dict) -> dict  # noqa
     """Generates JSON-LD data for product"""
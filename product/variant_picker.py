@@ -0,0 +1,75 @@
+"""
+Variant picker document
+
+Attribute combinations, prices, stock flags and images of all variants
+of a product, precomputed into one JSON-serializable dict and cached
+with the product tag, so product pages don't have to render variants
+into HTML.
+"""
+from django.utils import translation
+from django.utils.encoding import smart_text
+
+from caching.tags import get_or_set_tagged
+
+from .models import Product, ProductVariant, VariantImage
+from .utils import price_as_dict, price_range_as_dict
+from .versions import product_tag
+
+VARIANT_PICKER_KEY = 'product:variant-picker:%s:%s'
+
+
+def build_variant_picker_data(product_id):
+    product = Product.objects.select_related('product_type').get(
+        pk=product_id)
+    variants = list(ProductVariant.objects.filter(
+        product_id=product_id).with_stock().order_by('pk'))
+    images = {}
+    variant_images = VariantImage.objects.filter(
+        variant__product_id=product_id).order_by(
+            'image__order').values_list('variant_id', 'image_id')
+    for variant_id, image_id in variant_images:
+        images.setdefault(variant_id, []).append(image_id)
+
+    used_values = set()
+    for variant in variants:
+        used_values.update(variant.attributes.items())
+    attributes = []
+    variant_attributes = product.product_type.variant_attributes.all()
+    for attribute in variant_attributes.prefetch_related('values'):
+        attribute_pk = smart_text(attribute.pk)
+        values = [
+            {'pk': value.pk, 'name': value.name, 'slug': value.slug,
+             'color': value.color}
+            for value in attribute.values.all()
+            if (attribute_pk, smart_text(value.pk)) in used_values]
+        if values:
+            attributes.append({
+                'pk': attribute.pk, 'name': attribute.name,
+                'slug': attribute.slug, 'values': values})
+
+    return {
+        'productId': product.pk,
+        'showPicker': all(v.attributes for v in variants),
+        'priceRange': price_range_as_dict(product.get_gross_price_range()),
+        'attributes': attributes,
+        'variants': [{
+            'id': variant.pk,
+            'sku': variant.sku,
+            'name': variant.name,
+            'attributes': variant.attributes,
+            'price': price_as_dict(variant.get_price_per_item()),
+            'inStock': variant.is_in_stock(),
+            'images': images.get(variant.pk, [])}
+            for variant in variants]}
+
+
+def get_variant_picker_data(product_id):
+    """
+    Returns cached variant picker document of product, built again after
+    the product tag is bumped
+    """
+    # prices are localized, so the document depends on active language
+    key = VARIANT_PICKER_KEY % (product_id, translation.get_language())
+    return get_or_set_tagged(
+        key, lambda: build_variant_picker_data(product_id),
+        [product_tag(product_id)])
@@ -0,0 +1,28 @@
+"""
+Per-product cache versions
+
+Everything cached about a single product (variant picker document,
+rendered fragments) is tagged with the product instance tag, bumped by
+signal receivers whenever the product, its variants, stock or images
+change. Its version can key caches which can't validate tags themselves,
+like {% cache %} fragments.
+"""
+from caching.tags import get_tag_version, instance_tag, invalidate_tags
+
+from .models import Product
+
+
+def product_tag(product_id):
+    return instance_tag(Product, product_id)
+
+
+def get_product_version(product_id):
+    return get_tag_version(product_tag(product_id))
+
+
+def invalidate_products(product_ids):
+    """
+    Bumps tags of products only, bulk stock and image changes do not
+    purge cached listings
+    """
+    invalidate_tags(*[product_tag(product_id) for product_id in product_ids])
@@ -1,18 +1,32 @@
 from __future__ import unicode_literals
 
 import datetime
+import json
 
-from django.http import HttpResponsePermanentRedirect
+from django.http import Http404, HttpResponsePermanentRedirect, JsonResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.shortcuts import get_object_or_404, redirect
+from django.utils.functional import SimpleLazyObject
 
+from caching.middleware import add_page_tags, set_page_tags
+from caching.tags import get_tag_version, instance_tag
+
+from .category_tree import get_category_tree
 from .filters import (get_now_sorted_by,
                       ProductFilter, ProductCategoryFilter)
 from .models import Category, Product, AttributeChoiceValue, ProductVariant
 from .utils import (
+    ProductAvailability,
+    prefetch_product_details,
+    product_json_ld,
+    products_for_details,
     products_with_details,
     get_product_images,
     get_product_attributes_data,
+    products_visible_to_user,
 )
+from .variant_picker import get_variant_picker_data
+from .versions import get_product_version, product_tag
 from django.template.response import TemplateResponse
 
 
@@ -39,25 +53,25 @@ def product_details(request, slug, product_id, form=None):
     The following variables are available to the template:
     product:
         The Product instance itself.
+    product_version, category_version:
+        Versions of product and its category cached data, page fragments
+        (showing name and URL of the category as well) are cached under
+        them.
     is_visible:
         Whether the product is visible to regular users (for cases when an
         admin is previewing a product before publishing).
-    form:
-        The add-to-cart form.
-    price_range:
-        The PriceRange for the product including all discounts.
-    undiscounted_price_range:
-        The PriceRange excluding all discounts.
-    discount:
-        Either a Price instance equal to the discount value or None if no
-        discount was available.
-    local_price_range:
-        The same PriceRange from price_range represented in user's local
-        currency. The value will be None if exchange rate is not available or
-        the local currency is the same as site's default currency.
+    product_images, product_attributes, json_ld:
+        Loaded lazily, so rendering page from cached fragments does not
+        query them.
+    show_variant_picker:
+        Whether all variants have attributes to pick them by.
     """
-    products = products_with_details(user=request.user)
+    # cached page shows the product and the name and URL of its category
+    set_page_tags(request, product_tag(product_id))
+    products = products_for_details(user=request.user)
     product = get_object_or_404(products, id=product_id)
+    category_tag = instance_tag(Category, product.category_id)
+    add_page_tags(request, category_tag)
     if product.get_slug() != slug:
         return HttpResponsePermanentRedirect(product.get_absolute_url())
     today = datetime.date.today()
@@ -66,20 +80,48 @@ def product_details(request, slug, product_id, form=None):
     template_name = 'product/details_%s.html' % (
         type(product).__name__.lower(),)
     templates = [template_name, 'product/details.html']
-    product_images = get_product_images(product)
+    # variants themselves are loaded by the page from product_variants
+    variant_picker = get_variant_picker_data(product.pk)
+
+    def get_attributes():
+        return get_product_attributes_data(prefetch_product_details(product))
+
+    product_attributes = SimpleLazyObject(get_attributes)
+
+    def get_json_ld():
+        availability = ProductAvailability(
+            available=is_visible and any(
+                variant['inStock'] for variant in variant_picker['variants']),
+            price_range=product.get_gross_price_range())
+        data = product_json_ld(
+            prefetch_product_details(product), availability,
+            product_attributes)
+        # keep </script> in product texts from closing the script tag
+        data = json.dumps(data, cls=DjangoJSONEncoder)
+        return data.replace('<', '\\u003c')
 
-    product_attributes = get_product_attributes_data(product)
-    show_variant_picker = all([v.attributes for v in product.variants.all()])
     return TemplateResponse(
         request, templates,
         {'is_visible': is_visible,
          'product': product,
+         'product_version': get_product_version(product.pk),
+         'category_version': get_tag_version(category_tag),
          'product_attributes': product_attributes,
-         'product_images': product_images,
-         'show_variant_picker': show_variant_picker
+         'product_images': SimpleLazyObject(
+             lambda: get_product_images(prefetch_product_details(product))),
+         'json_ld': SimpleLazyObject(get_json_ld),
+         'show_variant_picker': variant_picker['showPicker']
          })
 
 
+def product_variants(request, product_id):
+    """Variant picker document of product, see variant_picker module"""
+    products = products_visible_to_user(request.user)
+    if not products.filter(pk=product_id).exists():
+        raise Http404('No product matches the given query.')
+    return JsonResponse(get_variant_picker_data(int(product_id)))
+
+
 # def product_add_to_cart(request, slug, product_id):
 #     # types: (int, str, dict) -> None
 #
@@ -127,21 +169,21 @@ def get_paginator_items(items, paginate_by, page_number):
 
 
 def category_index(request, path, category_id):
-    category = get_object_or_404(Category, id=category_id)
-    print(category)
-    actual_path = category.get_full_path()
-    if actual_path != path:
-        return redirect('product:category', permanent=True, path=actual_path,
-                        category_id=category_id)
-    # Check for subcategories
-    categories = category.get_descendants(include_self=True)
-    print(categories)
+    tree = get_category_tree()
+    category = tree.get(int(category_id))
+    if category is None:
+        raise Http404('No category matches the given query.')
+    if category.full_path != path:
+        return redirect('product:category', permanent=True,
+                        path=category.full_path, category_id=category_id)
+    # Products of category and all its subcategories
+    tree_id, lft, rght = tree.descendant_range(category.id)
     products = products_with_details(user=request.user).filter(
-        category__in=categories).order_by('name')
-    print(products)
+        category__tree_id=tree_id, category__lft__gte=lft,
+        category__rght__lte=rght).order_by('name')
     product_filter = ProductCategoryFilter(
-        request.GET, queryset=products, category=category)
+        request.GET, queryset=products, category=category.id)
 
-    ctx = {'filter': product_filter}
+    ctx = {'category': category, 'filter': product_filter}
 
-    return TemplateResponse(request, 'category/index.html', ctx)
\ No newline at end of file
+    return TemplateResponse(request, 'category/index.html', ctx)
@@ -13,6 +13,17 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'sku', 'price', 'slug', 'is_active',)
     ordering = ['-is_active', 'name']
     list_filter = ('is_active',)
+    actions = ['deactivate_products', 'restore_products']
+
+    def deactivate_products(self, request, queryset):
+        count = len(queryset.deactivate())
+        self.message_user(request, 'Deactivated %d products' % count)
+    deactivate_products.short_description = 'Deactivate selected products'
+
+    def restore_products(self, request, queryset):
+        count = len(queryset.restore())
+        self.message_user(request, 'Restored %d products' % count)
+    restore_products.short_description = 'Restore selected products'
 
 
 admin.site.register(Product, ProductAdmin)
@@ -0,0 +1,62 @@
+"""
+Snapshot of featured products
+
+The home page block and the empty search page show featured products
+from one cache entry holding their ids with pre-rendered card data.
+products.signals drop the snapshot whenever a product enters or leaves
+the featured set or a featured product changes, the next read builds it.
+"""
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .models.product import Product
+from .templatetags.product_cards import CARD_TEMPLATE
+
+FEATURED_PRODUCTS_KEY = 'products:featured'
+FEATURED_PRODUCTS_TIMEOUT = 24 * 60 * 60
+FEATURED_IMAGE_ALIAS = 'product_list'
+FEATURED_CONTENT_WORDS = 14
+
+
+class FeaturedProduct(namedtuple(
+        'FeaturedProduct', ('id', 'name', 'url', 'content', 'card'))):
+    """Card data of featured product, content is truncated"""
+
+    def get_absolute_url(self):
+        return self.url
+
+
+def build_featured_products():
+    products = Product.objects.featured().select_related('image')
+    return [
+        FeaturedProduct(
+            id=product.pk, name=product.name,
+            url=product.get_absolute_url(),
+            content=Truncator(product.content).words(FEATURED_CONTENT_WORDS),
+            card=mark_safe(render_to_string(
+                CARD_TEMPLATE,
+                {'product': product, 'image_alias': FEATURED_IMAGE_ALIAS})))
+        for product in products]
+
+
+def get_featured_products():
+    """Returns list of FeaturedProduct with one cache read"""
+    products = cache.get(FEATURED_PRODUCTS_KEY)
+    if products is None:
+        products = build_featured_products()
+        cache.set(FEATURED_PRODUCTS_KEY, products, FEATURED_PRODUCTS_TIMEOUT)
+    return products
+
+
+def is_featured_product(product_id):
+    """Whether product is in the cached snapshot, no query is made"""
+    products = cache.get(FEATURED_PRODUCTS_KEY) or []
+    return any(product.id == product_id for product in products)
+
+
+def invalidate_featured_products():
+    cache.delete(FEATURED_PRODUCTS_KEY)
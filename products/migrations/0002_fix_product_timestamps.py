@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        # columns were filled the other way round, swap the stored values
+        migrations.RunSQL(
+            'UPDATE products_product '
+            'SET created_at = updated_at, updated_at = created_at',
+            'UPDATE products_product '
+            'SET created_at = updated_at, updated_at = created_at'),
+    ]
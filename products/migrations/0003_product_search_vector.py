@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+FILL_SEARCH_VECTOR_SQL = '''
+    UPDATE products_product SET search_vector =
+        setweight(to_tsvector('english', name || ' ' || sku), 'A') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(category.name, ' ')
+            FROM products_category category
+            JOIN products_product_category membership
+                ON membership.category_id = category.id
+            WHERE membership.product_id = products_product.id), '')), 'B') ||
+        setweight(to_tsvector('english', perex || ' ' || content), 'C') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(category.description, ' ')
+            FROM products_category category
+            JOIN products_product_category membership
+                ON membership.category_id = category.id
+            WHERE membership.product_id = products_product.id), '')), 'D')
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_fix_product_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(FILL_SEARCH_VECTOR_SQL, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='products_search_vector_gin'),
+        ),
+    ]
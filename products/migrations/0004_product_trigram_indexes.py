@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Trigram indexes serving icontains/istartswith lookups of search
+    autocomplete, which compare UPPER() of the column
+    """
+
+    dependencies = [
+        ('products', '0003_product_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            'CREATE INDEX products_product_name_trgm '
+            'ON products_product USING gin (UPPER(name) gin_trgm_ops)',
+            'DROP INDEX products_product_name_trgm'),
+        migrations.RunSQL(
+            'CREATE INDEX products_product_sku_trgm '
+            'ON products_product USING gin (UPPER(sku) gin_trgm_ops)',
+            'DROP INDEX products_product_sku_trgm'),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    ProductManager.all() lists active products only, deactivated products
+    are kept in the table, so listings are served by a partial index
+    """
+
+    dependencies = [
+        ('products', '0005_product_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX products_product_active_created_id '
+            'ON products_product (created_at DESC, id DESC) '
+            'WHERE is_active',
+            'DROP INDEX products_product_active_created_id'),
+    ]
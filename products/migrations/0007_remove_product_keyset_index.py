@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Keyset pagination lists active products only, so it is served by the
+    partial index of 0006 alone
+    """
+
+    dependencies = [
+        ('products', '0006_product_active_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='products_created_id_idx',
+        ),
+    ]
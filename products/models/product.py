@@ -1,26 +1,134 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVectorField)
 from django.core.urlresolvers import reverse
-from django.db import models
-from django.db.models import Q
+from django.db import connection, connections, models
+from django.db.models import F, sql
+from django.utils import timezone
 from filer.fields.image import FilerImageField
 
 from .category import Category
 
+SEARCH_CONFIG = 'english'
+
+# name and SKU weigh most, then category names, then texts
+UPDATE_SEARCH_VECTOR_SQL = '''
+    UPDATE products_product SET search_vector =
+        setweight(to_tsvector(%(config)s, name || ' ' || sku), 'A') ||
+        setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(category.name, ' ')
+            FROM products_category category
+            JOIN products_product_category membership
+                ON membership.category_id = category.id
+            WHERE membership.product_id = products_product.id), '')), 'B') ||
+        setweight(to_tsvector(%(config)s, perex || ' ' || content), 'C') ||
+        setweight(to_tsvector(%(config)s, coalesce((
+            SELECT string_agg(category.description, ' ')
+            FROM products_category category
+            JOIN products_product_category membership
+                ON membership.category_id = category.id
+            WHERE membership.product_id = products_product.id), '')), 'D')
+    WHERE id = ANY(%(ids)s)
+'''
+
 
 class ProductQuerySet(models.QuerySet):
     def active(self):
         return self.filter(is_active=True)
 
+    def inactive(self):
+        return self.filter(is_active=False)
+
+    def set_active(self, is_active):
+        """
+        Flip is_active of products with one UPDATE of the changed rows,
+        which are announced by products.signals.active_changed.
+        Returns ids of changed products.
+        """
+        from products.signals import active_changed
+
+        changed = self.exclude(is_active=is_active)
+        values = {'is_active': is_active, 'updated_at': timezone.now()}
+        if connection.vendor == 'postgresql':
+            ids = changed.update_returning_ids(**values)
+        else:
+            # no UPDATE ... RETURNING, ids are read first
+            ids = list(changed.values_list('pk', flat=True))
+            changed.update(**values)
+        if ids:
+            active_changed.send(
+                sender=self.model, product_ids=ids, is_active=is_active)
+        return ids
+
+    def update_returning_ids(self, **values):
+        """
+        Same as update(), returns ids of updated rows instead of their
+        count (PostgreSQL only)
+        """
+        self._for_write = True
+        query = self.query.clone(sql.UpdateQuery)
+        query.add_update_values(values)
+        compiler = query.get_compiler(self.db)
+        compiler.pre_sql_setup()
+        update_sql, params = compiler.as_sql()
+        db_connection = connections[self.db]
+        pk_column = db_connection.ops.quote_name(self.model._meta.pk.column)
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                '%s RETURNING %s' % (update_sql, pk_column), params)
+            return [row[0] for row in cursor.fetchall()]
+    update_returning_ids.alters_data = True
+    update_returning_ids.queryset_only = True
+
+    def deactivate(self):
+        return self.set_active(False)
+
+    def restore(self):
+        return self.set_active(True)
+
+    def delete(self):
+        """
+        Products are never deleted (cart items and orders refer to them),
+        only deactivated. Returns the same counts as QuerySet.delete().
+        """
+        ids = self.deactivate()
+        return len(ids), {self.model._meta.label: len(ids)}
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def hard_delete(self):
+        return super(ProductQuerySet, self).delete()
+    hard_delete.alters_data = True
+    hard_delete.queryset_only = True
+
     def featured(self):
         return self.filter(is_active=True, is_featured=True)
 
     def search(self, query):
-        lookups = (Q(name__icontains=query) |
-                   Q(sku__icontains=query) |
-                   Q(content__icontains=query) |
-                   Q(category__name__icontains=query) |
-                   Q(category__description__icontains=query)
-        )
-        return self.filter(lookups).distinct()
+        """
+        Full text search over maintained search_vector column,
+        ordered by rank
+        """
+        query = SearchQuery(query, config=SEARCH_CONFIG)
+        return self.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)).order_by(
+                '-rank', '-created_at')
+
+    def update_search_vector(self):
+        """
+        Rebuild search_vector of products, with one UPDATE since it
+        depends on names and descriptions of their categories. Only
+        PostgreSQL has the column, see search.backends.
+        """
+        if connection.vendor != 'postgresql':
+            return
+        ids = list(self.values_list('pk', flat=True))
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                UPDATE_SEARCH_VECTOR_SQL,
+                {'config': SEARCH_CONFIG, 'ids': ids})
 
 
 class ProductManager(models.Manager):
@@ -48,8 +156,8 @@ class Product(models.Model):
         verbose_name='Reference Number',
         unique=True
     )
-    created_at = models.DateTimeField(auto_now=True, db_index=True)
-    updated_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     image = FilerImageField(null=True, blank=True, on_delete=models.DO_NOTHING)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     perex = models.TextField(max_length=255)
@@ -57,6 +165,8 @@ class Product(models.Model):
     category = models.ManyToManyField(Category, blank=True)
     is_active = models.BooleanField(default=True, verbose_name='Active')
     is_featured = models.BooleanField(default=False, verbose_name='Featured')
+    # maintained by ProductQuerySet.update_search_vector()
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = ProductManager()
 
@@ -65,7 +175,23 @@ class Product(models.Model):
     }
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        # keyset pagination of active products (see products.pagination)
+        # is served by partial index products_product_active_created_id,
+        # created in migration 0006
+        indexes = [
+            GinIndex(
+                fields=['search_vector'], name='products_search_vector_gin'),
+        ]
+
+    def delete(self, using=None, keep_parents=False):
+        """Deactivates product, see ProductQuerySet.delete()"""
+        self.is_active = False
+        return Product.objects.filter(pk=self.pk).delete()
+
+    def hard_delete(self, using=None, keep_parents=False):
+        return super(Product, self).delete(
+            using=using, keep_parents=keep_parents)
 
     @property
     def get_image_url(self):
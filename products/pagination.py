@@ -0,0 +1,58 @@
+"""
+Keyset pagination of products over (created_at, id)
+
+Pages continue after the last product of previous page, given by
+an opaque cursor, instead of skipping rows with OFFSET, and nothing is
+counted, so every page costs one indexed range scan.
+"""
+import base64
+import datetime
+from collections import namedtuple
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+KEYSET_ORDERING = ('-created_at', '-id')
+
+KeysetPage = namedtuple('KeysetPage', ['object_list', 'next_cursor'])
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(product):
+    value = '%s|%s' % (product.created_at.isoformat(), product.pk)
+    return base64.urlsafe_b64encode(value.encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        created_at, pk = value.decode('ascii').split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor('Invalid cursor: %r' % cursor)
+    if not isinstance(created_at, datetime.datetime):
+        raise InvalidCursor('Invalid cursor: %r' % cursor)
+    return created_at, pk
+
+
+def paginate_by_keyset(queryset, cursor, page_size):
+    """
+    Returns KeysetPage of products following cursor (first page when
+    cursor is empty), with cursor of the next page or None on last page
+    """
+    queryset = queryset.order_by(*KEYSET_ORDERING)
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    # one more product tells whether there is a next page
+    products = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(products) > page_size:
+        products = products[:page_size]
+        next_cursor = encode_cursor(products[-1])
+    return KeysetPage(products, next_cursor)
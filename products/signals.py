@@ -1,16 +1,102 @@
-from django.db.models.signals import pre_delete, post_delete
+import django.dispatch
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import (
+    m2m_changed, pre_delete, post_delete, post_save)
 from django.dispatch import receiver
 
+from caching.tags import (
+    CATALOG_TAG, instance_tag, invalidate_tags, publish_model_tags)
+from like.models import Like
+from product import renditions
+from .featured import invalidate_featured_products, is_featured_product
+from .models.category import Category
 from .models.product import Product
 
+# sent when searchable data of products (their texts or categories) change
+search_data_changed = django.dispatch.Signal(providing_args=['product_ids'])
+# sent by ProductQuerySet.set_active() for products it has changed
+active_changed = django.dispatch.Signal(
+    providing_args=['product_ids', 'is_active'])
 
-@receiver(pre_delete, sender=Product)
-def product_pre_delete_receiver(sender, instance, **kwargs):
-    """Instead of deleting object from DB set it's state is_active to False"""
-    instance.is_active = False
+publish_model_tags(Product, catalog=True)
+publish_model_tags(Category, catalog=True)
+
+
+def update_search_data(product_ids):
+    product_ids = list(product_ids)
+    Product.objects.filter(pk__in=product_ids).update_search_vector()
+    search_data_changed.send(sender=Product, product_ids=product_ids)
+
+
+@receiver(active_changed)
+def active_changed_receiver(sender, product_ids, **kwargs):
+    """set_active() updates products in bulk, without model signals"""
+    invalidate_tags(
+        CATALOG_TAG, *[instance_tag(Product, pk) for pk in product_ids])
+    invalidate_featured_products()
+
+
+@receiver(post_save, sender=Product)
+def product_post_save_receiver(sender, instance, **kwargs):
+    """
+    Rebuild search vector of product, drop featured products snapshot when
+    product is or was featured and generate missing thumbnails of product
+    image in background
+    """
+    update_search_data([instance.pk])
+    if instance.is_featured or is_featured_product(instance.pk):
+        invalidate_featured_products()
+    if instance.image_id:
+        renditions.schedule(
+            renditions.create_catalog_thumbnails, [instance.pk])
 
 
 @receiver(post_delete, sender=Product)
 def product_post_delete_receiver(sender, instance, **kwargs):
-    """Save changed state of instance"""
-    instance.save()
\ No newline at end of file
+    """Only hard_delete() deletes products"""
+    if is_featured_product(instance.pk):
+        invalidate_featured_products()
+
+
+@receiver(m2m_changed, sender=Product.category.through)
+def product_categories_changed_receiver(
+        sender, instance, action, reverse, pk_set, **kwargs):
+    """Category names are part of search vector of product"""
+    if reverse and action == 'pre_clear':
+        instance._cleared_product_ids = list(
+            instance.product_set.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        product_ids = [instance.pk]
+    elif action == 'post_clear':
+        product_ids = getattr(instance, '_cleared_product_ids', [])
+    else:
+        product_ids = pk_set
+    update_search_data(product_ids)
+
+
+@receiver(post_save, sender=Category)
+def category_post_save_receiver(sender, instance, **kwargs):
+    update_search_data(
+        instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def category_pre_delete_receiver(sender, instance, **kwargs):
+    instance._product_ids = list(
+        instance.product_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def category_post_delete_receiver(sender, instance, **kwargs):
+    update_search_data(instance._product_ids)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def like_changed_receiver(sender, instance, **kwargs):
+    """Likes count is shown on cached product page"""
+    product_type = ContentType.objects.get_for_model(Product)
+    if instance.receiver_content_type_id == product_type.pk:
+        invalidate_tags(instance_tag(Product, instance.receiver_object_id))
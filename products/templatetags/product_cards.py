@@ -0,0 +1,47 @@
+from django import template
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_TEMPLATE = 'product_card.html'
+CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def get_card_cache_key(product, image_alias):
+    # every save changes updated_at, so stale cards are never read
+    return 'products:card:%s:%s:%s' % (
+        image_alias, product.pk, product.updated_at.isoformat())
+
+
+@register.simple_tag
+def product_cards(products, image_alias):
+    """
+    Usage:
+        {% load product_cards %}
+        {% product_cards object_list 'product_list' as cards %}
+        {% for product, card in cards %}{{ card }}{% endfor %}
+
+    Returns (product, card HTML) pairs. Cards of the whole page are read
+    with one get_many, only missing cards are rendered (with their images
+    fetched then) and stored with one set_many.
+    """
+    products = list(products)
+    keys = [get_card_cache_key(product, image_alias) for product in products]
+    cards = cache.get_many(keys)
+    missing = [
+        product for product, key in zip(products, keys) if key not in cards]
+    if missing:
+        prefetch_related_objects(missing, 'image')
+        rendered = {
+            get_card_cache_key(product, image_alias): render_to_string(
+                CARD_TEMPLATE,
+                {'product': product, 'image_alias': image_alias})
+            for product in missing}
+        cache.set_many(rendered, CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    return [
+        (product, mark_safe(cards[key]))
+        for product, key in zip(products, keys)]
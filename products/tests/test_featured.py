@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from products.featured import get_featured_products
+from products.models.product import Product
+
+
+class FeaturedProductsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = [
+            Product.objects.create(
+                name='Test Product %s' % number,
+                slug='test-product-%s' % number,
+                sku='PROD%03d' % number, price=100,
+                content='Lorem ipsum', is_featured=number < 2)
+            for number in range(3)]
+
+    def test_snapshot_is_read_from_cache(self):
+        featured = get_featured_products()
+        self.assertEqual(
+            {product.id for product in featured},
+            {product.pk for product in self.products[:2]})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_featured_products(), featured)
+
+    def test_snapshot_follows_featured_changes(self):
+        get_featured_products()
+        product = self.products[2]
+        product.is_featured = True
+        product.save()
+        self.assertEqual(len(get_featured_products()), 3)
+
+        product = self.products[0]
+        product.is_featured = False
+        product.save()
+        self.assertEqual(len(get_featured_products()), 2)
+
+        Product.objects.filter(pk=self.products[1].pk).deactivate()
+        self.assertEqual(
+            [product.id for product in get_featured_products()],
+            [self.products[2].pk])
+
+    def test_renamed_featured_product_card_is_rendered_again(self):
+        get_featured_products()
+        product = self.products[0]
+        product.name = 'Renamed product'
+        product.save()
+        names = [product.name for product in get_featured_products()]
+        self.assertIn('Renamed product', names)
+
+    def test_home_page_shows_featured_products(self):
+        response = self.client.get(reverse('products:index'))
+        self.assertEqual(
+            len(response.context['featured_products']), 2)
+        self.assertContains(response, 'Featured')
+
+    def test_empty_search_shows_featured_products(self):
+        get_featured_products()
+        response = self.client.get(reverse('search:query'))
+        self.assertEqual(len(response.context['object_list']), 2)
+        self.assertContains(response, self.products[0].get_absolute_url())
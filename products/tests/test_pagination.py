@@ -0,0 +1,46 @@
+import datetime
+
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.utils import timezone
+
+from products.models.product import Product
+from products.pagination import paginate_by_keyset
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        created_at = timezone.now()
+        for number in range(5):
+            Product.objects.create(
+                name='Test Product %s' % number,
+                slug='test-product-%s' % number,
+                sku='PROD%03d' % number, price=100)
+        # two products created at the same moment are ordered by id
+        Product.objects.filter(slug__in=[
+            'test-product-1', 'test-product-2']).update(
+                created_at=created_at - datetime.timedelta(days=1))
+
+    def test_pages_cover_all_products_once(self):
+        products = Product.objects.all()
+        expected = list(products.values_list('pk', flat=True))
+        seen = []
+        cursor = None
+        while True:
+            page = paginate_by_keyset(products, cursor, 2)
+            seen.extend(product.pk for product in page.object_list)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_json_view(self):
+        url = reverse('products:json')
+        data = self.client.get(url, {'cursor': ''}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNone(data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('products:index'), {'cursor': 'x'})
+        self.assertEqual(response.status_code, 404)
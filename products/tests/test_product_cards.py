@@ -0,0 +1,35 @@
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+
+from products.models.product import Product
+
+
+@override_settings(PAGE_CACHE_URL_NAMES=[])
+class ProductCardsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [
+            Product.objects.create(
+                name='Test Product %s' % number,
+                slug='test-product-%s' % number,
+                sku='PROD%03d' % number,
+                price=100 + number,
+                is_active=True)
+            for number in range(5)]
+
+    def test_cached_cards_are_not_rendered_again(self):
+        url = reverse('products:index')
+        self.client.get(url)
+        # only the products, no images of cached cards
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, 'Test Product 4')
+
+    def test_saved_product_card_is_rendered_again(self):
+        url = reverse('products:index')
+        self.client.get(url)
+        product = self.products[0]
+        product.name = 'Renamed product'
+        product.save()
+        response = self.client.get(url)
+        self.assertContains(response, 'Renamed product')
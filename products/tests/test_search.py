@@ -0,0 +1,35 @@
+from django.test import TestCase
+
+from products.models.category import Category
+from products.models.product import Product
+
+
+class ProductSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(
+            name='Outerwear', slug='outerwear')
+        cls.jacket = Product.objects.create(
+            name='Rain jacket', slug='rain-jacket', sku='JACKET01',
+            price=100, content='Keeps you dry')
+        cls.boots = Product.objects.create(
+            name='Hiking boots', slug='hiking-boots', sku='BOOTS01',
+            price=120, content='Pairs well with a rain jacket')
+        cls.hidden = Product.objects.create(
+            name='Old jacket', slug='old-jacket', sku='JACKET00',
+            price=10, is_active=False)
+
+    def test_name_ranks_above_content(self):
+        results = list(Product.objects.search('jacket'))
+        self.assertEqual(results, [self.jacket, self.boots])
+
+    def test_category_names_are_searched(self):
+        self.assertFalse(Product.objects.search('outerwear').exists())
+        self.boots.category.add(self.category)
+        self.assertEqual(
+            list(Product.objects.search('outerwear')), [self.boots])
+
+        self.category.name = 'Footwear'
+        self.category.save()
+        self.assertEqual(
+            list(Product.objects.search('footwear')), [self.boots])
@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from caching.tags import CATALOG_TAG, get_tag_version
+from products.models.category import Category
+from products.models.product import Product
+
+
+class SoftDeleteTest(TestCase):
+    def setUp(self):
+        self.products = [
+            Product.objects.create(
+                name='Test Product %s' % number,
+                slug='test-product-%s' % number,
+                sku='PROD%03d' % number, price=100)
+            for number in range(3)]
+
+    def test_deactivate_and_restore_in_bulk(self):
+        version = get_tag_version(CATALOG_TAG)
+        queryset = Product.objects.filter(
+            pk__in=[p.pk for p in self.products[:2]])
+        # one UPDATE returning ids of changed products
+        with self.assertNumQueries(1):
+            self.assertEqual(len(queryset.deactivate()), 2)
+        self.assertEqual(list(Product.objects.all()), [self.products[2]])
+        self.assertNotEqual(get_tag_version(CATALOG_TAG), version)
+        # already deactivated products are left alone
+        self.assertEqual(queryset.deactivate(), [])
+
+        self.assertEqual(len(queryset.restore()), 2)
+        self.assertEqual(Product.objects.all().count(), 3)
+
+    def test_delete_keeps_rows(self):
+        product = self.products[0]
+        self.assertEqual(product.delete(), (1, {'products.Product': 1}))
+        self.assertFalse(product.is_active)
+        self.assertEqual(
+            Product.objects.filter(pk=self.products[1].pk).delete(),
+            (1, {'products.Product': 1}))
+        self.assertEqual(Product.objects.get_queryset().count(), 3)
+        self.assertEqual(Product.objects.get_queryset().inactive().count(), 2)
+
+    def test_hard_delete(self):
+        self.products[0].hard_delete()
+        self.assertEqual(Product.objects.get_queryset().count(), 2)
+
+    def test_deactivated_product_is_not_listed_in_category(self):
+        cache.clear()
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        for product in self.products:
+            product.category.add(category)
+        self.products[0].delete()
+        response = self.client.get(reverse(
+            'products:category', kwargs={'category_slug': 'shirts'}))
+        self.assertEqual(
+            set(response.context['products']), set(self.products[1:]))
@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.core.urlresolvers import reverse, resolve
 from django.test import TestCase, RequestFactory
 
@@ -7,6 +8,8 @@ from products.views import ProductsListView, ProductDetailView
 
 class ProductViewsTest(TestCase):
     def setUp(self):
+        # pages cached by earlier tests would be served without views
+        cache.clear()
         self.factory = RequestFactory()
         self.product_list_url = reverse('products:index')
         self.product_detail_url = reverse('products:detail', kwargs={
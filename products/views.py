@@ -1,10 +1,31 @@
-from django.views.generic import ListView, DetailView
+from django.http import Http404, JsonResponse
+from django.views.generic import ListView, DetailView, View
 
+from caching.middleware import set_page_tags
+from caching.tags import instance_tag
 from cart.forms import AddToCartForm
+from .featured import get_featured_products
 from .models.product import Product, Category
+from .pagination import InvalidCursor, paginate_by_keyset
 
+PRODUCTS_PAGE_SIZE = 48
 
-class CategoryDetailView(DetailView):
+
+class KeysetPaginationMixin(object):
+    """
+    Paginates products by keyset, page follows the 'cursor' GET parameter
+    """
+    page_size = PRODUCTS_PAGE_SIZE
+
+    def paginate_products(self, products):
+        try:
+            return paginate_by_keyset(
+                products, self.request.GET.get('cursor'), self.page_size)
+        except InvalidCursor:
+            raise Http404('Invalid cursor')
+
+
+class CategoryDetailView(KeysetPaginationMixin, DetailView):
     """
     View which display all products for current category
     """
@@ -15,30 +36,58 @@ class CategoryDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        products = Product.objects.filter(
-            category=self.get_object()
-        ).prefetch_related('image')
+        # images are fetched only for product cards missing in cache
+        page = self.paginate_products(
+            Product.objects.all().filter(category=self.object))
 
         context.update({
-            'products': products
+            'products': page.object_list,
+            'next_cursor': page.next_cursor,
         })
         return context
 
 
-class ProductsListView(ListView):
+class ProductsListView(KeysetPaginationMixin, ListView):
     """
     Main view to display all products
     """
     model = Product
-    queryset = Product.objects.all().active().prefetch_related('image')
+    # images are fetched only for product cards missing in cache
+    queryset = Product.objects.all().active()
     template_name = "product_list.html"
 
     def get_context_data(self, **kwargs):
+        page = self.paginate_products(self.object_list)
+        kwargs.update({
+            'object_list': page.object_list,
+            'next_cursor': page.next_cursor,
+        })
         context = super().get_context_data(**kwargs)
         context['form'] = AddToCartForm
+        if not self.request.GET.get('cursor'):
+            context['featured_products'] = get_featured_products()
         return context
 
 
+class ProductsJsonView(KeysetPaginationMixin, View):
+    """
+    Products as JSON, next page is requested with the returned cursor
+    """
+
+    def get(self, request, *args, **kwargs):
+        products = Product.objects.all().active().only(
+            'name', 'slug', 'price', 'created_at')
+        page = self.paginate_products(products)
+        return JsonResponse({
+            'results': [{
+                'id': product.pk,
+                'name': product.name,
+                'price': product.price,
+                'url': product.get_absolute_url()}
+                for product in page.object_list],
+            'next': page.next_cursor})
+
+
 class ProductDetailView(DetailView):
     """
     Product detail view
@@ -46,6 +95,12 @@ class ProductDetailView(DetailView):
     model = Product
     template_name = "product_detail.html"
 
+    def get_object(self, queryset=None):
+        product = super().get_object(queryset)
+        # cached page is purged by changes of the product and its likes
+        set_page_tags(self.request, instance_tag(Product, product.pk))
+        return product
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = AddToCartForm
@@ -1,3 +1,13 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import SearchQueryStat
+
+
+class SearchQueryStatAdmin(admin.ModelAdmin):
+    list_display = ('query', 'day', 'count', 'zero_results')
+    list_filter = ('day',)
+    search_fields = ('query',)
+    date_hierarchy = 'day'
+
+
+admin.site.register(SearchQueryStat, SearchQueryStatAdmin)
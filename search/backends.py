@@ -0,0 +1,179 @@
+"""
+Product search backends
+
+SearchProductView searches through the backend named in
+settings.SEARCH_BACKEND. Backends return ids of active products matching
+the query, best match first.
+"""
+import json
+import os
+import threading
+import time
+from itertools import chain
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from caching.tags import CATALOG_TAG, get_tag_version
+from products.models.product import Product
+
+from . import changelog, index
+
+# seconds a log entry may be missing before the index is rebuilt
+MISSING_CHANGE_WAIT = 10
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.SEARCH_BACKEND)()
+    return _backend
+
+
+class BaseSearchBackend(object):
+    # results depend on state of the process, so they are not shared
+    is_process_local = False
+
+    def get_version(self):
+        """Version of searched data, results are cached under it"""
+        return get_tag_version(CATALOG_TAG)
+
+    def search(self, query, limit=None):
+        raise NotImplementedError
+
+    def estimate_count(self, query):
+        """Cheap estimate of number of matches, None when unknown"""
+        return None
+
+    def update_products(self, product_ids):
+        """Called when products or their categories have changed"""
+
+    def remove_products(self, product_ids):
+        """Called when products have been deleted"""
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Full text search over products_product.search_vector"""
+
+    def search(self, query, limit=None):
+        ids = Product.objects.search(query).values_list('pk', flat=True)
+        if limit is not None:
+            ids = ids[:limit]
+        return list(ids)
+
+    def estimate_count(self, query):
+        """Row estimate of the query planner, nothing is counted"""
+        products = Product.objects.search(query).order_by()
+        sql, params = products.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    """
+    In-process inverted index, see search.index
+
+    The index is loaded from settings.SEARCH_INDEX_PATH snapshot or built
+    from the database on the first search. Changes of every process are
+    logged to search.changelog and each process re-indexes the products
+    logged since its index version on its next search. When the log
+    can't be replayed the index is rebuilt in a background thread,
+    meanwhile searches are served by the previous index.
+    """
+    is_process_local = True
+
+    def __init__(self, rebuild_in_background=True):
+        self.rebuild_in_background = rebuild_in_background
+        self._index = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        # (version, time) of the first log entry found missing
+        self._missing = None
+
+    @property
+    def index(self):
+        # only the first load is waited for
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self.load_index()
+        version = changelog.get_version()
+        if (self._index.version != version and
+                self._lock.acquire(blocking=False)):
+            try:
+                self.catch_up(version)
+            finally:
+                self._lock.release()
+        return self._index
+
+    def get_version(self):
+        # the previous index may still be searched while rebuilding
+        return self.index.version
+
+    def load_index(self):
+        path = settings.SEARCH_INDEX_PATH
+        if path and os.path.exists(path):
+            snapshot = index.InvertedIndex.load(path)
+            changes = changelog.get_changes(
+                snapshot.version, changelog.get_version())
+            if changes is not None:
+                return snapshot
+        return index.build_index()
+
+    def catch_up(self, version):
+        """Re-index products logged since the index version, locked"""
+        current = self._index
+        changes = changelog.get_changes(current.version, version)
+        if changes is None:
+            self.rebuild()
+            return
+        if changes:
+            index.update_products(current, chain.from_iterable(changes))
+            current.version += len(changes)
+        if current.version == version:
+            self._missing = None
+            return
+        # the next entry is being written, or it is lost when it stays
+        # missing for a while
+        missing = current.version + 1
+        if self._missing is None or self._missing[0] != missing:
+            self._missing = (missing, time.time())
+        elif time.time() - self._missing[1] > MISSING_CHANGE_WAIT:
+            self.rebuild()
+
+    def rebuild(self):
+        if self._rebuilding:
+            return
+        if not self.rebuild_in_background:
+            self._index = index.build_index()
+            return
+        self._rebuilding = True
+        threading.Thread(
+            target=self.run_rebuild, name='search-index-rebuild',
+            daemon=True).start()
+
+    def run_rebuild(self):
+        try:
+            self._index = index.build_index()
+        finally:
+            self._rebuilding = False
+            self._missing = None
+            # the thread has its own connection, don't keep it open
+            connection.close()
+
+    def search(self, query, limit=None):
+        return self.index.search(query, limit=limit)
+
+    def update_products(self, product_ids):
+        # this process replays the log on its next search too
+        changelog.log_changes(product_ids)
+
+    def remove_products(self, product_ids):
+        changelog.log_changes(product_ids)
@@ -0,0 +1,76 @@
+"""
+Log of searched product changes shared by processes
+
+Every process searching with InvertedIndexSearchBackend keeps its own
+index. Processes changing products append their ids to a log in the
+shared cache and indexes catch up by re-indexing just the logged
+products. Entries are numbered by a counter and an index records the
+number of the last entry it has applied, so it is rebuilt only when the
+entries it misses are gone from the cache or there are too many of them.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'search-index:version'
+CHANGE_KEY = 'search-index:change:%d'
+CHANGE_TIMEOUT = 60 * 60
+# ids per entry, entries stay well below memcached item size
+CHANGE_SIZE = 1000
+# indexes missing more entries are rebuilt instead
+MAX_REPLAYED_CHANGES = 500
+
+
+def get_version():
+    """Number of the last logged entry"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # time based, so a counter evicted from cache starts past the
+        # numbers handed out before and indexes see the entries missing
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _next_version(delta=1):
+    try:
+        return cache.incr(VERSION_KEY, delta)
+    except ValueError:
+        get_version()
+        return cache.incr(VERSION_KEY, delta)
+
+
+def request_rebuild():
+    """Make every index rebuild, for changes too big to be logged"""
+    _next_version(MAX_REPLAYED_CHANGES + 1)
+
+
+def log_changes(product_ids):
+    """Append ids of changed or deleted products"""
+    product_ids = list(product_ids)
+    chunks = [
+        product_ids[start:start + CHANGE_SIZE]
+        for start in range(0, len(product_ids), CHANGE_SIZE)]
+    if len(chunks) > MAX_REPLAYED_CHANGES:
+        request_rebuild()
+        return
+    for chunk in chunks:
+        cache.set(CHANGE_KEY % _next_version(), chunk, CHANGE_TIMEOUT)
+
+
+def get_changes(since, until):
+    """
+    Returns id lists of entries logged after since up to until, stopping
+    at the first entry not in the cache (being written or lost), or None
+    when the index at since has to be rebuilt
+    """
+    if until < since or until - since > MAX_REPLAYED_CHANGES:
+        return None
+    keys = [CHANGE_KEY % version for version in range(since + 1, until + 1)]
+    entries = cache.get_many(keys)
+    changes = []
+    for key in keys:
+        if key not in entries:
+            break
+        changes.append(entries[key])
+    return changes
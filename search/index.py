@@ -0,0 +1,221 @@
+"""
+In-process inverted index of products.Product
+
+For deployments without PostgreSQL full text search. Every token maps
+to a posting list kept as two parallel arrays (sorted product ids and
+term frequencies), queries are ANDs of their tokens ranked with BM25.
+The index is built from the database or loaded from a snapshot file
+written by the build_search_index command. Changed products are logged
+to search.changelog and re-indexed by every process on its next search.
+"""
+import math
+import pickle
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# tokens of a field are counted this many times
+FIELD_WEIGHTS = (
+    ('name', 3),
+    ('sku', 3),
+    ('categories', 2),
+    ('perex', 1),
+    ('content', 1),
+)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SNAPSHOT_FORMAT = 3
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def product_document(product, category_names):
+    """Weighted token counts of product"""
+    fields = {
+        'name': product.name, 'sku': product.sku,
+        'categories': ' '.join(category_names),
+        'perex': product.perex, 'content': product.content}
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for token in tokenize(fields[field]):
+            counts[token] += weight
+    return counts
+
+
+class InvertedIndex(object):
+    def __init__(self):
+        # token: (array of product ids, array of term frequencies)
+        self.postings = {}
+        # product id: (document length, tokens)
+        self.documents = {}
+        self.total_length = 0
+        # number of the last search.changelog entry applied
+        self.version = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.documents
+
+    @property
+    def average_length(self):
+        if not self.documents:
+            return 0.0
+        return self.total_length / len(self.documents)
+
+    def add(self, doc_id, counts):
+        """Index document given as {token: frequency}, replacing it"""
+        self.remove(doc_id)
+        if not counts:
+            return
+        for token, frequency in counts.items():
+            ids, frequencies = self.postings.setdefault(
+                token, (array('l'), array('l')))
+            position = bisect_left(ids, doc_id)
+            ids.insert(position, doc_id)
+            frequencies.insert(position, frequency)
+        length = sum(counts.values())
+        self.documents[doc_id] = (length, tuple(counts))
+        self.total_length += length
+
+    def remove(self, doc_id):
+        document = self.documents.pop(doc_id, None)
+        if document is None:
+            return
+        length, tokens = document
+        self.total_length -= length
+        for token in tokens:
+            ids, frequencies = self.postings[token]
+            position = bisect_left(ids, doc_id)
+            del ids[position]
+            del frequencies[position]
+            if not ids:
+                del self.postings[token]
+
+    def search(self, query, limit=None):
+        """
+        Returns ids of documents containing all tokens of query,
+        best BM25 score first
+        """
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        postings = []
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                return []
+            postings.append(posting)
+        # walk the shortest posting list, look the others up by bisection
+        postings.sort(key=lambda posting: len(posting[0]))
+        total = len(self.documents)
+        average_length = self.average_length
+        idfs = [
+            math.log(1 + (total - len(ids) + 0.5) / (len(ids) + 0.5))
+            for ids, _frequencies in postings]
+        scores = []
+        shortest_ids, shortest_frequencies = postings[0]
+        for doc_id, frequency in zip(shortest_ids, shortest_frequencies):
+            matched = [frequency]
+            for ids, frequencies in postings[1:]:
+                position = bisect_left(ids, doc_id)
+                if position == len(ids) or ids[position] != doc_id:
+                    break
+                matched.append(frequencies[position])
+            else:
+                length = self.documents[doc_id][0]
+                norm = BM25_K1 * (
+                    1 - BM25_B + BM25_B * length / average_length)
+                score = sum(
+                    idf * tf * (BM25_K1 + 1) / (tf + norm)
+                    for idf, tf in zip(idfs, matched))
+                scores.append((-score, doc_id))
+        scores.sort()
+        if limit is not None:
+            scores = scores[:limit]
+        return [doc_id for _score, doc_id in scores]
+
+    def save(self, path):
+        with open(path, 'wb') as stream:
+            pickle.dump(
+                (SNAPSHOT_FORMAT, self.postings, self.documents,
+                 self.total_length, self.version),
+                stream, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as stream:
+            snapshot = pickle.load(stream)
+        if snapshot[0] != SNAPSHOT_FORMAT:
+            raise ValueError('Unsupported search index snapshot format')
+        index = cls()
+        (_format, index.postings, index.documents, index.total_length,
+         index.version) = snapshot
+        return index
+
+
+def get_category_names(products):
+    """Returns {product id: [category names]} with one query"""
+    from products.models.product import Product
+
+    Membership = Product.category.through
+    names = {}
+    memberships = Membership.objects.filter(
+        product__in=products).values_list('product_id', 'category__name')
+    for product_id, name in memberships:
+        names.setdefault(product_id, []).append(name)
+    return names
+
+
+def index_products(index, products):
+    """Add active products to index and remove inactive ones"""
+    products = list(products)
+    category_names = get_category_names([p.pk for p in products])
+    for product in products:
+        if product.is_active:
+            index.add(product.pk, product_document(
+                product, category_names.get(product.pk, [])))
+        else:
+            index.remove(product.pk)
+
+
+def update_products(index, product_ids, chunk_size=2000):
+    """Re-index products, removing the deleted ones"""
+    from products.models.product import Product
+
+    product_ids = sorted(set(product_ids))
+    products = Product.objects.get_queryset().only(
+        'name', 'sku', 'perex', 'content', 'is_active')
+    for start in range(0, len(product_ids), chunk_size):
+        chunk_ids = product_ids[start:start + chunk_size]
+        chunk = list(products.filter(pk__in=chunk_ids))
+        index_products(index, chunk)
+        for product_id in set(chunk_ids) - {p.pk for p in chunk}:
+            index.remove(product_id)
+
+
+def build_index(chunk_size=2000):
+    from products.models.product import Product
+
+    from .changelog import get_version
+
+    index = InvertedIndex()
+    # read first, so changes made while building are replayed after
+    index.version = get_version()
+    products = Product.objects.all().only(
+        'name', 'sku', 'perex', 'content', 'is_active').order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(products.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return index
+        index_products(index, chunk)
+        last_pk = chunk[-1].pk
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from search.index import build_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Build inverted index of active products and save its snapshot, '
+        'loaded by InvertedIndexSearchBackend on first search')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.SEARCH_INDEX_PATH,
+            help='Snapshot file, SEARCH_INDEX_PATH by default')
+
+    def handle(self, *args, **options):
+        index = build_index()
+        index.save(options['output'])
+        self.stdout.write('Indexed %d products, %d tokens' % (
+            len(index), len(index.postings)))
@@ -1,3 +1,36 @@
+import datetime
+
 from django.db import models
+from django.db.models import F, Sum
+from django.utils import timezone
+
+
+class SearchQueryStatQuerySet(models.QuerySet):
+    def popular(self, days=7, limit=10):
+        """Most searched queries of last days which found something"""
+        since = timezone.now().date() - datetime.timedelta(days=days)
+        return self.filter(day__gte=since).values('query').annotate(
+            searches=Sum('count'), misses=Sum('zero_results')).filter(
+                searches__gt=F('misses')).order_by(
+                    '-searches', 'query')[:limit]
+
+
+class SearchQueryStat(models.Model):
+    """
+    Daily rollup of normalized search queries, written in bulk by
+    search.querylog
+    """
+    query = models.CharField(max_length=100)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    # how many of the searches found nothing
+    zero_results = models.PositiveIntegerField(default=0)
+
+    objects = SearchQueryStatQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('query', 'day')
+        indexes = [models.Index(fields=['day'], name='search_stat_day_idx')]
 
-# Create your models here.
+    def __str__(self):
+        return '%s (%s): %d' % (self.query, self.day, self.count)
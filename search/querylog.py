@@ -0,0 +1,141 @@
+"""
+Buffered search query log
+
+Requests only count normalized queries in memory. Counts are written to
+SearchQueryStat rollup rows in one statement per flush, by a background
+thread every flush_interval seconds or as soon as flush_size distinct
+queries are buffered, so logging never writes in the request path.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SearchQueryStat
+from .utils import normalize_query
+
+logger = logging.getLogger(__name__)
+
+POPULAR_QUERIES_KEY = 'search:popular-queries'
+
+UPSERT_SQL = '''
+    INSERT INTO {table} ({query}, {day}, {count}, {zero_results})
+    VALUES %s
+    ON CONFLICT ({query}, {day}) DO UPDATE SET
+        {count} = {table}.{count} + EXCLUDED.{count},
+        {zero_results} = {table}.{zero_results} + EXCLUDED.{zero_results}
+'''
+
+
+class QueryLog(object):
+    def __init__(self, flush_size=500, flush_interval=60):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        # (query, day): [count, zero_results]
+        self.buffer = {}
+        self.lock = threading.Lock()
+        self.flush_requested = threading.Event()
+        self.thread = None
+
+    def record(self, query, result_count):
+        query = normalize_query(query)
+        if not query:
+            return
+        key = (query, timezone.now().date())
+        with self.lock:
+            counts = self.buffer.setdefault(key, [0, 0])
+            counts[0] += 1
+            if not result_count:
+                counts[1] += 1
+            pending = len(self.buffer)
+        self.start()
+        if pending >= self.flush_size:
+            self.flush_requested.set()
+
+    def start(self):
+        if self.thread is not None or self.flush_interval is None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='search-query-log', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush_safely)
+
+    def run(self):
+        while True:
+            self.flush_requested.wait(self.flush_interval)
+            self.flush_requested.clear()
+            self.flush_safely()
+            # the thread has its own connection, don't keep it open
+            connection.close()
+
+    def flush_safely(self):
+        try:
+            self.flush()
+        except DatabaseError:
+            # statistics are not worth failing for, buffered counts are lost
+            logger.exception('Search query log flush failed')
+
+    def flush(self):
+        """Write buffered counts, returns number of written rows"""
+        with self.lock:
+            rows = [
+                (query, day, count, zero_results)
+                for (query, day), (count, zero_results)
+                in self.buffer.items()]
+            self.buffer = {}
+        if not rows:
+            return 0
+        if connection.vendor == 'postgresql':
+            self.upsert(rows)
+        else:
+            self.update_or_create(rows)
+        return len(rows)
+
+    def upsert(self, rows):
+        from psycopg2.extras import execute_values
+
+        opts = SearchQueryStat._meta
+        sql = UPSERT_SQL.format(
+            table=connection.ops.quote_name(opts.db_table),
+            query=opts.get_field('query').column,
+            day=opts.get_field('day').column,
+            count=opts.get_field('count').column,
+            zero_results=opts.get_field('zero_results').column)
+        with transaction.atomic(), connection.cursor() as cursor:
+            execute_values(cursor.cursor, sql, rows, page_size=1000)
+
+    def update_or_create(self, rows):
+        with transaction.atomic():
+            for query, day, count, zero_results in rows:
+                updated = SearchQueryStat.objects.filter(
+                    query=query, day=day).update(
+                        count=F('count') + count,
+                        zero_results=F('zero_results') + zero_results)
+                if not updated:
+                    SearchQueryStat.objects.create(
+                        query=query, day=day, count=count,
+                        zero_results=zero_results)
+
+
+query_log = QueryLog(
+    flush_size=settings.SEARCH_QUERY_LOG_FLUSH_SIZE,
+    flush_interval=settings.SEARCH_QUERY_LOG_FLUSH_INTERVAL)
+
+
+def get_popular_queries():
+    """Popular queries from the rollup, cached for a few minutes"""
+    queries = cache.get(POPULAR_QUERIES_KEY)
+    if queries is None:
+        queries = [
+            row['query'] for row in SearchQueryStat.objects.popular()]
+        cache.set(
+            POPULAR_QUERIES_KEY, queries,
+            settings.SEARCH_POPULAR_QUERIES_CACHE_TIMEOUT)
+    return queries
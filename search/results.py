@@ -0,0 +1,93 @@
+"""
+Cache of search results
+
+Only the best settings.SEARCH_RESULTS_LIMIT matches of a query are
+ranked, for bigger results the total is estimated by the backend instead
+of counted. Ranked ids of a normalized query are kept in a bounded
+in-process LRU and, when settings.SEARCH_RESULTS_SHARED_CACHE is set, in
+the shared cache too, unless the backend searches an index of its own
+process. Entries are keyed on the version of searched data given by
+the backend, so any product or category change makes all of them
+unreachable.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .backends import get_search_backend
+from .utils import normalize_query, query_cache_key
+
+
+# total is exact unless truncated, then an estimate or None when unknown
+SearchResults = namedtuple('SearchResults', ['ids', 'total', 'truncated'])
+
+
+class LRUCache(object):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                self.data.move_to_end(key)
+            except KeyError:
+                return default
+            return self.data[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+local_results = LRUCache(settings.SEARCH_RESULTS_LOCAL_CACHE_SIZE)
+
+
+def search(query):
+    backend = get_search_backend()
+    limit = settings.SEARCH_RESULTS_LIMIT
+    # one more id tells whether there are more matches than the limit
+    ids = backend.search(query, limit=limit + 1)
+    if len(ids) <= limit:
+        return SearchResults(tuple(ids), len(ids), False)
+    total = backend.estimate_count(query)
+    if total is not None:
+        total = max(total, len(ids))
+    return SearchResults(tuple(ids[:limit]), total, True)
+
+
+def get_results(query):
+    """Returns SearchResults of products matching query"""
+    query = normalize_query(query)
+    if not query:
+        return SearchResults((), 0, False)
+    backend = get_search_backend()
+    version = backend.get_version()
+    local_key = (version, query)
+    results = local_results.get(local_key)
+    if results is not None:
+        return results
+    shared_key = query_cache_key('search:results:%s' % version, query)
+    # a stale index of one process must not answer for all of them
+    shared = (
+        settings.SEARCH_RESULTS_SHARED_CACHE and
+        not backend.is_process_local)
+    if shared:
+        results = cache.get(shared_key)
+    if results is None:
+        results = search(query)
+        if shared:
+            cache.set(
+                shared_key, results, settings.SEARCH_RESULTS_CACHE_TIMEOUT)
+    local_results.set(local_key, results)
+    return results
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from products.models.product import Product
+from products.signals import active_changed, search_data_changed
+
+from .backends import get_search_backend
+
+
+@receiver(search_data_changed)
+@receiver(active_changed)
+def search_data_changed_receiver(sender, product_ids, **kwargs):
+    get_search_backend().update_products(product_ids)
+
+
+# products are deleted only by hard_delete()
+@receiver(post_delete, sender=Product)
+def product_post_delete_receiver(sender, instance, **kwargs):
+    get_search_backend().remove_products([instance.pk])
@@ -1,3 +1,208 @@
-from django.test import TestCase
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase, override_settings
+
+from products.models.category import Category
+from products.models.product import Product
+
+from . import changelog
+from .backends import InvertedIndexSearchBackend
+from .index import InvertedIndex
+from .models import SearchQueryStat
+from .querylog import QueryLog, query_log
+from .results import get_results, local_results
+from .utils import normalize_query, query_cache_key
+
+
+class NormalizeQueryTest(TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query('  Rain   JACKET '), 'rain jacket')
+        self.assertEqual(normalize_query(None), '')
+
+
+class AutocompleteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Product.objects.create(
+            name='Rain jacket', slug='rain-jacket', sku='JACKET01',
+            price=100)
+        Product.objects.create(
+            name='Jacket hanger', slug='jacket-hanger', sku='HANGER01',
+            price=5)
+        Product.objects.create(
+            name='Old jacket', slug='old-jacket', sku='JACKET00',
+            price=10, is_active=False)
+
+    def test_prefix_matches_first(self):
+        response = self.client.get(
+            reverse('search:autocomplete'), {'q': ' JACK'})
+        data = response.json()
+        self.assertEqual(data['query'], 'jack')
+        self.assertEqual(
+            [result['name'] for result in data['results']],
+            ['Jacket hanger', 'Rain jacket'])
+
+    def test_cached_per_prefix(self):
+        url = reverse('search:autocomplete')
+        self.client.get(url, {'q': 'jacket'})
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'q': 'Jacket'})
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_short_prefix(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('search:autocomplete'), {'q': 'ja'})
+        self.assertEqual(response.json()['results'], [])
+
+
+class InvertedIndexTest(TestCase):
+    def setUp(self):
+        self.index = InvertedIndex()
+        self.index.add(1, {'rain': 3, 'jacket': 3})
+        self.index.add(2, {'hiking': 3, 'boots': 3, 'jacket': 1})
+        self.index.add(3, {'rain': 1, 'boots': 3})
+
+    def test_and_query_ranked(self):
+        self.assertEqual(self.index.search('jacket'), [1, 2])
+        self.assertEqual(self.index.search('rain jacket'), [1])
+        self.assertEqual(self.index.search('rain coat'), [])
+
+    def test_replace_and_remove(self):
+        self.index.add(1, {'umbrella': 3})
+        self.assertEqual(self.index.search('jacket'), [2])
+        self.index.remove(2)
+        self.assertEqual(self.index.search('jacket'), [])
+        self.assertNotIn('hiking', self.index.postings)
+
+    def test_snapshot(self):
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        self.index.save(path)
+        loaded = InvertedIndex.load(path)
+        self.assertEqual(loaded.search('boots'), self.index.search('boots'))
+
+
+@override_settings(SEARCH_INDEX_PATH=None)
+class InvertedIndexSearchBackendTest(TestCase):
+    def setUp(self):
+        self.jacket = Product.objects.create(
+            name='Rain jacket', slug='rain-jacket', sku='JACKET01',
+            price=100, content='Keeps you dry')
+        Product.objects.create(
+            name='Old jacket', slug='old-jacket', sku='JACKET00',
+            price=10, is_active=False)
+        self.backend = InvertedIndexSearchBackend(
+            rebuild_in_background=False)
+
+    def test_search_and_update(self):
+        self.assertEqual(self.backend.search('jacket'), [self.jacket.pk])
+        category = Category.objects.create(name='Outerwear', slug='outer')
+        self.jacket.category.add(category)
+        self.backend.update_products([self.jacket.pk])
+        self.assertEqual(self.backend.search('outerwear'), [self.jacket.pk])
+        self.jacket.is_active = False
+        self.jacket.save()
+        self.backend.update_products([self.jacket.pk])
+        self.assertEqual(self.backend.search('jacket'), [])
+
+    def test_changes_of_other_processes_are_replayed(self):
+        self.assertEqual(self.backend.search('jacket'), [self.jacket.pk])
+        # changed and logged elsewhere
+        Product.objects.filter(pk=self.jacket.pk).update(name='Rain coat')
+        self.assertEqual(self.backend.search('coat'), [])
+        changelog.log_changes([self.jacket.pk])
+        with mock.patch('search.index.build_index') as build_index:
+            self.assertEqual(self.backend.search('coat'), [self.jacket.pk])
+        build_index.assert_not_called()
+
+    def test_index_is_rebuilt_when_log_cannot_be_replayed(self):
+        self.assertEqual(self.backend.search('jacket'), [self.jacket.pk])
+        Product.objects.filter(pk=self.jacket.pk).update(name='Rain coat')
+        changelog.request_rebuild()
+        self.assertEqual(self.backend.search('coat'), [self.jacket.pk])
+
+
+class QueryLogTest(TestCase):
+    def setUp(self):
+        # no background thread, flushed explicitly
+        self.query_log = QueryLog(flush_size=100, flush_interval=None)
+
+    def test_counts_are_aggregated_and_added_up(self):
+        self.query_log.record('Jacket', 3)
+        self.query_log.record(' jacket ', 0)
+        self.query_log.record('boots', 1)
+        self.assertEqual(self.query_log.flush(), 2)
+        self.query_log.record('JACKET', 2)
+        self.query_log.flush()
+        stat = SearchQueryStat.objects.get(query='jacket')
+        self.assertEqual((stat.count, stat.zero_results), (3, 1))
+
+    def test_popular_skips_queries_without_results(self):
+        for query, results in [
+                ('jacket', 1), ('jacket', 1), ('boots', 1), ('xyz', 0)]:
+            self.query_log.record(query, results)
+        self.query_log.flush()
+        self.assertEqual(
+            [row['query'] for row in SearchQueryStat.objects.popular()],
+            ['jacket', 'boots'])
+
+
+@mock.patch.object(query_log, 'record')
+class SearchResultsCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(30):
+            Product.objects.create(
+                name='Rain jacket %s' % number,
+                slug='rain-jacket-%s' % number, sku='JACKET%02d' % number,
+                price=100)
+
+    def setUp(self):
+        local_results.clear()
+
+    def test_cached_ids_and_page_hydration(self, record):
+        url = reverse('search:query')
+        self.client.get(url, {'q': 'jacket'})
+        # products of the second page only, no search
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'q': 'JACKET ', 'page': 2})
+        self.assertEqual(len(response.context['object_list']), 6)
+        record.assert_called_with('JACKET ', 30)
+
+    def test_product_save_invalidates_results(self, record):
+        url = reverse('search:query')
+        self.client.get(url, {'q': 'umbrella'})
+        product = Product.objects.first()
+        product.name = 'Umbrella'
+        product.save()
+        response = self.client.get(url, {'q': 'umbrella'})
+        self.assertEqual(list(response.context['object_list']), [product])
+
+    @override_settings(SEARCH_INDEX_PATH=None)
+    def test_results_of_process_local_index_are_not_shared(self, record):
+        backend = InvertedIndexSearchBackend()
+        with mock.patch(
+                'search.results.get_search_backend', return_value=backend):
+            results = get_results('jacket')
+        self.assertEqual(results.total, 30)
+        key = query_cache_key(
+            'search:results:%s' % backend.get_version(), 'jacket')
+        self.assertIsNone(cache.get(key))
+
+    @override_settings(SEARCH_RESULTS_LIMIT=10)
+    def test_results_are_bounded(self, record):
+        url = reverse('search:query')
+        response = self.client.get(url, {'q': 'jacket'})
+        results = response.context['results']
+        self.assertEqual(len(results.ids), 10)
+        self.assertTrue(results.truncated)
+        self.assertGreaterEqual(results.total, 11)
+        # pages past the ranked ids are not served
+        response = self.client.get(url, {'q': 'jacket', 'page': 2})
+        self.assertEqual(response.status_code, 404)
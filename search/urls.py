@@ -1,9 +1,11 @@
 from django.conf.urls import url
 from .views import (
-     SearchProductView
+     SearchProductView,
+     autocomplete,
 )
 
 
 urlpatterns = [
     url(r'^$', SearchProductView.as_view(), name='query'),
+    url(r'^autocomplete/$', autocomplete, name='autocomplete'),
 ]
\ No newline at end of file
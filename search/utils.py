@@ -0,0 +1,17 @@
+import hashlib
+import re
+
+MAX_QUERY_LENGTH = 100
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_query(query):
+    """Lowercase query with collapsed whitespace, '' for empty queries"""
+    query = WHITESPACE_RE.sub(' ', query or '').strip().lower()
+    return query[:MAX_QUERY_LENGTH]
+
+
+def query_cache_key(prefix, query):
+    # queries may contain characters not allowed in memcached keys
+    digest = hashlib.md5(query.encode('utf-8')).hexdigest()
+    return '%s:%s' % (prefix, digest)
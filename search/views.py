@@ -1,23 +1,85 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.http import JsonResponse
 from django.views.generic import ListView
 
+from caching.tags import CATALOG_TAG, get_or_set_tagged
+from products.featured import get_featured_products
 from products.models.product import Product
 
+from .querylog import get_popular_queries, query_log
+from .results import get_results
+from .utils import normalize_query, query_cache_key
+
+AUTOCOMPLETE_MIN_LENGTH = 3
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_CACHE_TIMEOUT = 60
+
 
 class SearchProductView(ListView):
     template_name = "search/view.html"
+    paginate_by = 24
+
+    def get(self, request, *args, **kwargs):
+        self.query = request.GET.get('q')
+        self.results = None
+        return super(SearchProductView, self).get(request, *args, **kwargs)
 
     def get_context_data(self, *args, **kwargs):
         context = super(SearchProductView, self).get_context_data(*args, **kwargs)
-        query = self.request.GET.get('q')
-        context['query'] = query
-        # SearchQuery.objects.create(query=query)
+        context['query'] = self.query
+        if self.results is not None:
+            context['results'] = self.results
+            context['results_limit'] = settings.SEARCH_RESULTS_LIMIT
+        if not self.query:
+            context['popular_queries'] = get_popular_queries()
         return context
 
     def get_queryset(self, *args, **kwargs):
-        request = self.request
-        method_dict = request.GET
-        query = method_dict.get('q', None)
-        if query is not None:
-            return Product.objects.search(query)
-        return Product.objects.featured()
\ No newline at end of file
+        if self.query is not None:
+            # ids only, products of the displayed page are loaded then,
+            # pages past the ranked ids are not found
+            self.results = get_results(self.query)
+            query_log.record(self.query, len(self.results.ids))
+            return self.results.ids
+        return get_featured_products()
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, object_list, is_paginated = super(
+            SearchProductView, self).paginate_queryset(queryset, page_size)
+        if self.query is not None:
+            page_ids = list(object_list)
+            products = Product.objects.all().in_bulk(page_ids)
+            object_list = [products[pk] for pk in page_ids if pk in products]
+            page.object_list = object_list
+        return paginator, page, object_list, is_paginated
+
+
+def get_autocomplete_results(prefix):
+    """
+    Names and SKUs of active products containing the prefix, products
+    starting with it first. Served by trigram indexes on UPPER(name) and
+    UPPER(sku), which icontains and istartswith lookups compare.
+    """
+    lookup = Q(name__icontains=prefix) | Q(sku__icontains=prefix)
+    starts_with = Q(name__istartswith=prefix) | Q(sku__istartswith=prefix)
+    products = Product.objects.all().filter(lookup).annotate(
+        starts_with=Case(
+            When(starts_with, then=Value(0)), default=Value(1),
+            output_field=IntegerField())).order_by('starts_with', 'name')
+    products = products.only('name', 'sku', 'slug')[:AUTOCOMPLETE_LIMIT]
+    return [
+        {'name': product.name, 'sku': product.sku,
+         'url': product.get_absolute_url()}
+        for product in products]
+
+
+def autocomplete(request):
+    prefix = normalize_query(request.GET.get('q'))
+    results = []
+    if len(prefix) >= AUTOCOMPLETE_MIN_LENGTH:
+        results = get_or_set_tagged(
+            query_cache_key('search:autocomplete', prefix),
+            lambda: get_autocomplete_results(prefix), [CATALOG_TAG],
+            AUTOCOMPLETE_CACHE_TIMEOUT)
+    return JsonResponse({'query': prefix, 'results': results})